@@ -78,6 +78,10 @@ OUTPUT_HANDLER = 4
 """Custom output handler"""
 OUTPUT_TEXT_FILE = 5
 """Text file output"""
+OVERFLOW_BLOCK = 0
+"""Reader waits for processing when message queue is full"""
+OVERFLOW_DROP = 1
+"""Reader discards messages when message queue is full"""
 VERBOSITY_CRITICAL = -1
 """Verbosity critical"""
 VERBOSITY_LOW = 0
@@ -108,6 +112,14 @@ LOGFORMAT = "{asctime}.{msecs:.0f} - {levelname} - {name} - {message}"
 """Logging format"""
 LOGLIMIT = 10485760  # max size of logfile in bytes
 """Logfile limit"""
+SOCKET_RCVBUF = 4194304  # TCP socket receive buffer size in bytes
+"""Socket receive buffer size (capped by OS limits)"""
+KEEPALIVE_IDLE = 30  # seconds
+"""Idle time before first TCP keepalive probe"""
+KEEPALIVE_INTERVAL = 10  # seconds
+"""Interval between TCP keepalive probes"""
+KEEPALIVE_COUNT = 3
+"""Number of unanswered TCP keepalive probes before connection is dropped"""
 NOGGA = -1
 """No GGA sentence to be sent (for NTRIP caster)"""
 EPILOG = (
@@ -3,10 +3,11 @@ gnssmqttclient.py
 
 MQTT SPARTN client class, retrieving correction data from an IP (MQTT)
 source and (optionally) sending the data to a designated writeable output
-medium (serial, file, socket, queue).
+medium (serial, file, socket, queue or raw file descriptor).
 
 Calling app, if defined, can implement the following methods:
- - set_event() - create <<spartn_read>> event
+ - set_event() - create <<spartn_read>> event (raised once per message,
+   or once per MQTT payload if the 'coalesce' kwarg is set)
  - dialog() - return reference to MQTT client configuration dialog
 
 Can utilise the following environment variables:
@@ -32,11 +33,10 @@ Created on 20 Feb 2023
 import socket
 from io import BufferedWriter, BytesIO, TextIOWrapper
 from logging import getLogger
-from os import getenv, path
+from os import getenv, path, write
 from pathlib import Path
 from queue import Queue
-from threading import Event, Thread
-from time import sleep
+from threading import Event, Thread, current_thread
 
 import paho.mqtt.client as mqtt
 from paho.mqtt import __version__ as PAHO_MQTT_VERSION
@@ -69,6 +69,8 @@ from pygnssutils.helpers import set_logging
 from pygnssutils.mqttmessage import MQTTMessage
 
 TIMEOUT = 8
+RECONNECT_MIN = 1  # minimum reconnect delay in seconds
+RECONNECT_MAX = 30  # maximum reconnect delay in seconds
 DLGTSPARTN = "SPARTN Configuration"
 
 _global_timetags = {}  # for want of a better approach
@@ -77,6 +79,12 @@ _global_timetags = {}  # for want of a better approach
 class GNSSMQTTClient:
     """
     SPARTN MQTT client class.
+
+    If the calling app implements set_event(), it is notified once per
+    message. If the 'coalesce' kwarg is set, it is instead notified once
+    per MQTT payload. As a payload may contain several UBX or SPARTN
+    messages, the app must then drain all available data from the output
+    queue on each event, rather than getting a single item.
     """
 
     def __init__(self, app=None, **kwargs):
@@ -84,6 +92,8 @@ class GNSSMQTTClient:
         Constructor.
 
         :param object app: application from which this class is invoked (None)
+        :param bool coalesce: (kwarg) notify calling app once per MQTT payload \
+            rather than once per message (False)
         """
 
         self.__app = app  # Reference to calling application class (if applicable)
@@ -119,14 +129,13 @@ class GNSSMQTTClient:
         }
 
         self._timeout = kwargs.get("timeout", TIMEOUT)
+        self._coalesce = bool(kwargs.get("coalesce", False))
         self.errevent = kwargs.get("errevent", Event())
-        self._logpath = kwargs.get("logpath", ".")
-        self._loglines = 0
         self._socket = None
         self._connected = False
         self._stopevent = Event()
         self._mqtt_thread = None
-        self._logfile = ""
+        self._client = None
 
     def __enter__(self):
         """
@@ -174,6 +183,13 @@ class GNSSMQTTClient:
         """
         Start MQTT handler thread.
 
+        If `output` is an integer file descriptor (e.g. `file.fileno()` or
+        one end of an `os.pipe()`), raw data is written directly via
+        `os.write()`, bypassing any Python-level buffering. The caller is then
+        responsible for any `os.fsync()` required for durability.
+
+        :param object output: (kwarg) writeable output medium \
+            (serial, file, socket, queue, file descriptor) (None)
         :returns: return code
         :rtype: int
         """
@@ -236,6 +252,13 @@ class GNSSMQTTClient:
         """
 
         self._stopevent.set()
+        if self._client is not None:
+            self._client.disconnect()  # breaks out of client network loop
+            self._client = None
+        # wait for handler thread to finish, so that a subsequent start()
+        # cannot overlap it (unless called from the handler thread itself)
+        if self._mqtt_thread is not None and self._mqtt_thread is not current_thread():
+            self._mqtt_thread.join(self._timeout)
         self._mqtt_thread = None
         self.logger.info("MQTT Client Stopped.")
 
@@ -271,6 +294,9 @@ class GNSSMQTTClient:
             topics.append((TOPIC_FREQ, 0))
         userdata = {
             "output": settings["output"],
+            "writer": self._get_writer(settings["output"], app),
+            "notify": getattr(app, "set_event", None),
+            "coalesce": self._coalesce,
             "topics": topics,
             "app": app,
             "decode": settings["spartndecode"],
@@ -291,10 +317,13 @@ class GNSSMQTTClient:
                     client_id=settings["clientid"],
                     userdata=userdata,
                 )
+            self._client = client
             client.on_connect = self.on_connect
             client.on_disconnect = self.on_disconnect
             client.on_message = self.on_message
             client.tls_set(certfile=settings["tlscrt"], keyfile=settings["tlskey"])
+            # back off exponentially when reconnecting after a dropped connection
+            client.reconnect_delay_set(min_delay=RECONNECT_MIN, max_delay=RECONNECT_MAX)
             i = 1
             while not stopevent.is_set():
                 try:
@@ -307,22 +336,60 @@ class GNSSMQTTClient:
                             + f":{settings['port']} in {timeout} seconds. {err}"
                         ) from err
                     self.logger.info(f"Trying to connect {i} ...")
-                    sleep(timeout / 4)
+                    stopevent.wait(timeout / 4)
                     i += 1
 
-            client.loop_start()
-            while not stopevent.is_set():
-                # run the client loop in the same thread, as callback access gnss
-                # client.loop(timeout=0.1)
-                sleep(0.1)
+            # run the client network loop in this thread, blocking on socket
+            # I/O until stop() disconnects the client
+            if not stopevent.is_set():
+                client.loop_forever()
         except (FileNotFoundError, TimeoutError) as err:
             self.logger.critical(f"ERROR! {err}")
             GNSSMQTTClient.on_error(userdata, err)
             self.stop()
             self.errevent.set()
 
-        finally:
-            client.loop_stop()
+    @staticmethod
+    def _get_writer(output: object, app: object) -> object:
+        """
+        Resolve write function for designated output medium once,
+        rather than testing the output type for every message.
+
+        :param object output: writeable output medium \
+            (serial, file, socket, queue, file descriptor)
+        :param object app: calling application
+        :returns: function f(raw, parsed), or None if no output
+        :rtype: object
+        """
+
+        if isinstance(output, (Serial, BufferedWriter)):
+            return lambda raw, parsed: output.write(raw)
+        if isinstance(output, TextIOWrapper):
+            return lambda raw, parsed: output.write(str(parsed))
+        if isinstance(output, Queue):
+            rawonly = app == CLIAPP
+            return lambda raw, parsed: output.put(raw if rawonly else (raw, parsed))
+        if isinstance(output, socket.socket):
+            return lambda raw, parsed: output.sendall(raw)
+        # raw file descriptor (bool is a subclass of int, so exclude it)
+        if isinstance(output, int) and not isinstance(output, bool):
+            return lambda raw, parsed: GNSSMQTTClient._write_fd(output, raw)
+        return None
+
+    @staticmethod
+    def _write_fd(fd: int, data: bytes):
+        """
+        Write all data to raw file descriptor. os.write() may write
+        fewer bytes than requested (e.g. to a pipe or socket), so
+        keep writing until the remaining data is exhausted.
+
+        :param int fd: file descriptor
+        :param bytes data: data to write
+        """
+
+        view = memoryview(data)
+        while view:
+            view = view[write(fd, view) :]
 
     @staticmethod
     def on_connect(client, userdata, flags, rcd):  # pylint: disable=unused-argument
@@ -362,14 +429,16 @@ class GNSSMQTTClient:
         :param int rcd: return status code
         """
 
-        GNSSMQTTClient.on_error(userdata, rcd)
+        if rcd != 0:  # 0 = disconnect requested by stop()
+            GNSSMQTTClient.on_error(userdata, rcd)
 
     @staticmethod
     def on_message(client, userdata, msg):  # pylint: disable=unused-argument
         """
         The callback for when a PUBLISH message is received from the server.
         Some MQTT topics may contain more than one UBX or SPARTN message in
-        a single payload.
+        a single payload. The calling app is notified that data is available
+        after each message or, if coalescing, once after the whole payload.
 
         :param object client: MQTT client
         :param list userdata: list of user defined data items
@@ -377,8 +446,9 @@ class GNSSMQTTClient:
         """
 
         global _global_timetags
-        output = userdata["output"]
-        app = userdata["app"]
+        writer = userdata["writer"]
+        notify = userdata["notify"]
+        coalesce = userdata["coalesce"]
         msglogger = userdata["logger"]
 
         def do_write(raw: bytes, parsed: object):
@@ -396,25 +466,19 @@ class GNSSMQTTClient:
                 msglogger.info(parsed.identity)
             msglogger.debug(parsed)
 
-            if output is not None:
-                if isinstance(output, (Serial, BufferedWriter)):
-                    output.write(raw)
-                elif isinstance(output, TextIOWrapper):
-                    output.write(str(parsed))
-                elif isinstance(output, Queue):
-                    output.put(raw if app == CLIAPP else (raw, parsed))
-                elif isinstance(output, socket.socket):
-                    output.sendall(raw)
-
-            if app is not None:
-                if hasattr(app, "set_event"):
-                    app.set_event(SPARTN_EVENT)
+            if writer is not None:
+                writer(raw, parsed)
+            if notify is not None and not coalesce:
+                notify(SPARTN_EVENT)
 
         if "ubx" in msg.topic:  # UBX MGA-* or RXM-SPARTNKEY messages
             ubr = UBXReader(BytesIO(msg.payload), msgmode=SET)
             try:
-                for raw, parsed in ubr:
+                # read until EOF directly rather than via the iterator protocol
+                raw, parsed = ubr.read()
+                while raw is not None or parsed is not None:
                     do_write(raw, parsed)
+                    raw, parsed = ubr.read()
             except UBXParseError:
                 parsed = f"MQTT UBXParseError {msg.topic} {msg.payload}"
                 do_write(msg.payload, parsed)
@@ -431,21 +495,24 @@ class GNSSMQTTClient:
                 quitonerror=ERRLOG,
             )
             try:
-                for raw, parsed in spr:
+                raw, parsed = spr.read()
+                while raw is not None or parsed is not None:
                     do_write(raw, parsed)
+                    raw, parsed = spr.read()
                 _global_timetags = spr.timetags
             except (
                 SPARTNMessageError,
                 SPARTNParseError,
                 SPARTNStreamError,
+                SPARTNDecryptionError,
             ) as err:
                 msglogger.error(err)
                 parsed = f"{msg.topic} {err}"
                 do_write(msg.payload, parsed)
-            except SPARTNDecryptionError as err:
-                msglogger.error(err)
-                parsed = f"{msg.topic} {err}"
-                do_write(msg.payload, parsed)
+
+        # if coalescing, notify calling app once per payload
+        if notify is not None and coalesce:
+            notify(SPARTN_EVENT)
 
     @staticmethod
     def on_error(userdata: dict, err: object):
@@ -11,7 +11,9 @@ Can also transmit client position back to NTRIP server at specified
 intervals via formatted NMEA GGA sentences.
 
 Calling app, if defined, can implement the following methods:
-- set_event() - create <<ntrip_read>> event
+- set_event() - create <<ntrip_read>> event (raised once per message,
+  or only when data is put on an empty output queue if the 'coalesce'
+  kwarg is set)
 - dialog() - return reference to NTRIP config client dialog
 - get_coordinates() - return coordinates from receiver
 
@@ -29,12 +31,13 @@ Created on 03 Jun 2022
 import socket
 import ssl
 from base64 import b64encode
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from io import BufferedWriter, TextIOWrapper
-from logging import getLogger
+from logging import INFO, getLogger
 from os import getenv
 from queue import Queue
 from threading import Event, Thread
+from time import monotonic
 
 from certifi import where as findcacerts
 from pynmeagps import GET, NMEAMessage
@@ -65,7 +68,13 @@ from pygnssutils.globals import (
     OUTPORT_NTRIP,
     VERBOSITY_MEDIUM,
 )
-from pygnssutils.helpers import find_mp_distance, ipprot2int, set_logging
+from pygnssutils.helpers import (
+    find_mp_distance,
+    ipprot2int,
+    set_keepalive,
+    set_logging,
+    set_socket_options,
+)
 from pygnssutils.socketwrapper import SocketWrapper
 
 TIMEOUT = 3
@@ -83,6 +92,12 @@ WAITTIME = 3
 class GNSSNTRIPClient:
     """
     NTRIP client class.
+
+    If the calling app implements set_event(), it is notified once per
+    message. If the 'coalesce' kwarg is set and output is a queue, it is
+    instead only notified when data is put on an empty queue. The app must
+    then drain all available data from the queue on each event, rather
+    than getting a single item.
     """
 
     def __init__(
@@ -97,6 +112,8 @@ class GNSSNTRIPClient:
         :param int retries: (kwarg) maximum failed connection retries (5)
         :param int retryinterval: (kwarg) retry interval in seconds (10)
         :param int timeout: (kwarg) inactivity timeout in seconds (10)
+        :param bool coalesce: (kwarg) only notify calling app when data is put \
+            on an empty output queue, rather than once per message (False)
         """
 
         self.__app = app  # Reference to calling application class (if applicable)
@@ -106,7 +123,6 @@ class GNSSNTRIPClient:
         self.logger = getLogger(__name__)
         for module in ("pyrtcm", "pyspartn"):
             set_logging(getLogger(module), self.verbosity, self.logtofile)
-        self._ntripqueue = Queue()
         # initialise and persist settings to allow any calling app to retrieve them
         self._settings = {}
         self.settings = self._settings
@@ -115,6 +131,7 @@ class GNSSNTRIPClient:
             self._retries = int(kwargs.pop("retries", MAX_RETRY))
             self._retryinterval = int(kwargs.pop("retryinterval", RETRY_INTERVAL))
             self._timeout = int(kwargs.pop("timeout", INACTIVITY_TIMEOUT))
+            self._coalesce = bool(kwargs.pop("coalesce", False))
         except (ParameterError, ValueError, TypeError) as err:
             msg = f"Invalid input arguments {err}"
             self._app_update_status(False, (str(err), "red"))
@@ -123,13 +140,17 @@ class GNSSNTRIPClient:
         self._connected = False
         self._stopevent = Event()
         self._sleepevent = Event()
-        self._last_gga = datetime.fromordinal(1)
+        self._last_gga = float("-inf")  # monotonic time of last GGA sent
         self._retrycount = 0
         self._ntrip_version = NTRIP2
         self._response_headers = {}
         self._response_status = {}
         self._response_body = None
         self._output = None
+        self._writer = None
+        self._isqueue = False
+        self._credentials = ""
+        self._notify = None
 
     def __enter__(self):
         """
@@ -185,9 +206,16 @@ class GNSSNTRIPClient:
 
         try:
             self._stopevent = kwargs.get("stopevent", self._stopevent)
-            self._last_gga = datetime.fromordinal(1)
+            self._last_gga = float("-inf")
             self.settings = kwargs
             self._output = kwargs.get("output", None)
+            self._writer = self._get_writer(self._output)
+            self._isqueue = isinstance(self._output, Queue)
+            self._notify = getattr(self.__app, "set_event", None)
+            # encode credentials once rather than on every (re)connection
+            self._credentials = b64encode(
+                f"{self._settings['ntripuser']}:{self._settings['ntrippassword']}".encode()
+            ).decode()
 
             if self._settings["server"] == "":
                 raise ParameterError(f"Invalid server URL {self._settings['server']}")
@@ -207,7 +235,6 @@ class GNSSNTRIPClient:
             args=(
                 self._settings,
                 self._stopevent,
-                self._output,
             ),
             daemon=True,
         ).start()
@@ -228,7 +255,6 @@ class GNSSNTRIPClient:
         self,
         settings: dict,
         stopevent: Event,
-        output: object,
     ):
         """
         Main read thread.
@@ -238,7 +264,6 @@ class GNSSNTRIPClient:
 
         :param dict settings: settings as dictionary
         :param Event stopevent: stop event
-        :param object output: output stream for raw data
         """
 
         self._retrycount = 0
@@ -250,7 +275,7 @@ class GNSSNTRIPClient:
 
             try:
                 sock = self._open_connection(settings)
-                if not self._do_request(sock, settings, stopevent, output):
+                if not self._do_request(sock, settings, stopevent):
                     # bad response or sourcetable, so quit
                     self.stop()
                     break
@@ -265,7 +290,7 @@ class GNSSNTRIPClient:
                 socket.gaierror,
                 TimeoutError,
             ) as err:
-                errm = str(repr(err))
+                errm = repr(err)
                 if self._retrycount == self._retries:
                     errc = errm  # no more retries so critical error
                 else:
@@ -288,7 +313,7 @@ class GNSSNTRIPClient:
             except OSError:  # socket already closed, ignore
                 errc = "socket closed"
             except Exception as err:  # pylint: disable=broad-exception-caught
-                errc = str(repr(err))
+                errc = repr(err)
 
             if errc != "":  # break connection on critical error
                 self.stop()
@@ -312,10 +337,17 @@ class GNSSNTRIPClient:
         """
 
         hostname = settings["server"]
-        sock = socket.create_connection(
-            (socket.gethostbyname(hostname), int(settings["port"])),
-            timeout=self._timeout,
-        )
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            # options must be set before connecting, as the receive
+            # buffer size determines the negotiated TCP window
+            set_socket_options(sock)
+            set_keepalive(sock)
+            sock.settimeout(self._timeout)
+            sock.connect((socket.gethostbyname(hostname), int(settings["port"])))
+        except OSError:
+            sock.close()
+            raise
         if int(settings["https"]):
             context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
             context.load_verify_locations(findcacerts())
@@ -341,14 +373,12 @@ class GNSSNTRIPClient:
         sock: socket,
         settings: dict,
         stopevent: Event,
-        output: object,
     ) -> int:
         """
         Send HTTP request to NTRIP server and process incoming data.
 
         :param dict settings: settings as dictionary
         :param Event stopevent: stop event
-        :param object output: output stream for raw data
         :returns rc: return code (0 - stop, 1 - ok)
         :rtype: int
         :raises: Various socket error types if connection fails
@@ -358,6 +388,7 @@ class GNSSNTRIPClient:
         self.logger.debug(f"Request headers:\n{request_headers}")
         self._response_body = b""
         response_header = True
+        header = b""
 
         sock.sendall(request_headers.encode())
 
@@ -366,25 +397,31 @@ class GNSSNTRIPClient:
             if len(data) == 0:
                 break
             if response_header:
-                data = self._parse_response_header(data)
+                # response header may span more than one read
+                header += data
+                if b"\r\n\r\n" not in header and header[:12] != b"ICY 200 OK\r\n":
+                    continue
+                # any body content read along with header is retained
+                data = self._parse_response_header(header)
                 response_header = False
-            else:
-                if self.is_gnssdata:
-                    # stream gnss data until disconnection
-                    msg = (
-                        f"Streaming {settings['datatype']} data from "
-                        f"{settings['server']}:{settings['port']}/{settings['mountpoint']} ..."
-                    )
-                    self._app_update_status(True, (msg, "blue"))
-                    self._parse_ntrip_data(
-                        sock,
-                        settings,
-                        stopevent,
-                        output,
-                    )
-                else:  # sourcetable
-                    self._response_body = self._response_body + data
-
+            if self.is_gnssdata:
+                # stream gnss data until disconnection
+                msg = (
+                    f"Streaming {settings['datatype']} data from "
+                    f"{settings['server']}:{settings['port']}/{settings['mountpoint']} ..."
+                )
+                self._app_update_status(True, (msg, "blue"))
+                self._parse_ntrip_data(
+                    sock,
+                    settings,
+                    stopevent,
+                    data,
+                )
+            else:  # sourcetable
+                self._response_body = self._response_body + data
+
+        if response_header and header:  # connection closed within header
+            self._parse_response_header(header)
         if not self.responseok:
             msg = (
                 f"Connection failed {self._response_status['code']} "
@@ -396,7 +433,7 @@ class GNSSNTRIPClient:
             stable = self._parse_sourcetable(self.response_body)
             self._settings["sourcetable"] = stable
             mp, dist = self._get_closest_mountpoint()
-            self._do_output(output, stable, (mp, dist))
+            self._do_output(stable, (mp, dist))
             self._app_update_status(False, ("Sourcetable retrieved", "blue"))
             return 0
 
@@ -415,8 +452,6 @@ class GNSSNTRIPClient:
         path = settings["mountpoint"]
         hostname = settings["server"]
         port = settings["port"]
-        user = settings["ntripuser"]
-        password = settings["ntrippassword"]
         ntrip_version = settings["version"]
         ggainterval = settings["ggainterval"]
         if ggainterval == NOGGA:
@@ -424,8 +459,7 @@ class GNSSNTRIPClient:
         else:
             gga, _ = self._format_gga()
 
-        cred = b64encode(f"{user}:{password}".encode()).decode()
-        headers += f"Authorization: Basic {cred}\r\n"
+        headers += f"Authorization: Basic {self._credentials}\r\n"
         httpver = "1.1"
         gga_as_data = ""
         if ntrip_version == NTRIP2:
@@ -489,7 +523,7 @@ class GNSSNTRIPClient:
         sock: socket,
         settings: dict,
         stopevent: Event,
-        output: object,
+        data: bytes = b"",
     ):
         """
         Read and parse incoming NTRIP RTCM3/SPARTN data stream.
@@ -497,14 +531,18 @@ class GNSSNTRIPClient:
         :param socket sock: raw socket
         :param dict settings: settings as dictionary
         :param Event stopevent: stop event
+        :param bytes data: any data already read along with response header (b"")
         :raises: TimeoutError if inactivity timeout exceeded
         """
 
         parser = None
         raw_data = None
         parsed_data = None
-        last_activity = datetime.now()
-        stream = SocketWrapper(sock, self.encoding)
+        # monotonic clock is cheaper than datetime and unaffected by clock changes
+        last_activity = monotonic()
+        stream = SocketWrapper(sock, self.encoding, data=data)
+        ggainterval = settings["ggainterval"]
+        sendgga = ggainterval != NOGGA
 
         # parser will wrap socket as SocketStream
         if settings["datatype"].lower() == SPARTN:
@@ -529,18 +567,20 @@ class GNSSNTRIPClient:
             try:
                 raw_data, parsed_data = parser.read()
                 if raw_data is None:
-                    if datetime.now() - last_activity > timedelta(
-                        seconds=self._timeout
-                    ):
+                    if monotonic() - last_activity > self._timeout:
                         raise TimeoutError(
                             f"Inactivity timeout error after {self._timeout} seconds"
                         )
                 else:
-                    if hasattr(parsed_data, "identity"):
+                    # only format log message if it will be emitted
+                    if self.logger.isEnabledFor(INFO) and hasattr(
+                        parsed_data, "identity"
+                    ):
                         self.logger.info(f"Message received: {parsed_data.identity}")
-                    self._do_output(output, raw_data, parsed_data)
-                    last_activity = datetime.now()
-                self._send_gga(sock, settings["ggainterval"], output)
+                    self._do_output(raw_data, parsed_data)
+                    last_activity = monotonic()
+                if sendgga:
+                    self._send_gga(sock, ggainterval)
 
             except (
                 RTCMMessageError,
@@ -551,7 +591,7 @@ class GNSSNTRIPClient:
                 SPARTNTypeError,
             ) as err:
                 parsed_data = f"Error parsing data stream {err}"
-                self._do_output(output, raw_data, parsed_data)
+                self._do_output(raw_data, parsed_data)
                 continue
 
     def _parse_sourcetable(self, response: str) -> list:
@@ -567,11 +607,8 @@ class GNSSNTRIPClient:
         sourcetable = []
         response = response.split("\r\n")
         for line in response:
-            if line.find("STR;") >= 0:  # mountpoint entry
-                strbits = line.split(";")
-                if strbits[0] == "STR":
-                    strbits.pop(0)
-                    sourcetable.append(strbits)
+            if line.startswith("STR;"):  # mountpoint entry
+                sourcetable.append(line.split(";")[1:])
         return sourcetable
 
     def _serialize_sourcetable(self, sourcetable: list) -> bytes:
@@ -631,22 +668,21 @@ class GNSSNTRIPClient:
         except ValueError:
             return None, None
 
-    def _send_gga(self, sock: socket, ggainterval: int, output: object):
+    def _send_gga(self, sock: socket, ggainterval: int):
         """
         Send NMEA GGA sentence to NTRIP server at prescribed interval.
 
         :param socket sock: open socket
         :param int ggainterval: GGA send interval in seconds (-1 = don't send)
-        :param object output: writeable output medium e.g. serial port
         """
 
         if ggainterval != NOGGA:
-            if datetime.now() > self._last_gga + timedelta(seconds=ggainterval):
+            if monotonic() - self._last_gga > ggainterval:
                 raw_data, parsed_data = self._format_gga()
                 if parsed_data is not None:
                     sock.sendall(raw_data)
-                    self._do_output(output, raw_data, parsed_data)
-                self._last_gga = datetime.now()
+                    self._do_output(raw_data, parsed_data)
+                self._last_gga = monotonic()
 
     def _get_closest_mountpoint(self) -> tuple:
         """
@@ -674,34 +710,57 @@ class GNSSNTRIPClient:
             return None, None
         return closest_mp, dist
 
-    def _do_output(self, output: object, raw: bytes, parsed: object):
+    def _get_writer(self, output: object) -> object:
+        """
+        Resolve write function for designated output medium once,
+        rather than testing the output type for every message.
+
+        :param object output: writeable output medium for raw data
+        :returns: function f(raw, parsed), or None if no output
+        :rtype: object
+        """
+
+        if isinstance(output, (Serial, BufferedWriter)):
+            return lambda raw, parsed: output.write(raw)
+        if isinstance(output, TextIOWrapper):
+            return lambda raw, parsed: output.write(str(parsed))
+        if isinstance(output, Queue):
+            if self.__app == CLIAPP:
+                return lambda raw, parsed: output.put(raw)
+            return lambda raw, parsed: output.put((raw, parsed))
+        if isinstance(output, socket.socket):
+            return lambda raw, parsed: output.sendall(raw)
+        return None
+
+    def _do_output(self, raw: bytes, parsed: object):
         """
         Send sourcetable/closest mountpoint or RTCM3/SPARTN data to designated output medium.
 
         If output is Queue, will send both raw and parsed data.
 
-        :param object output: writeable output medium for raw data
+        The calling app is notified of every message unless coalescing is
+        enabled and output is Queue, in which case it is only notified when
+        the data is the sole item on the queue. If other items are queued, an
+        earlier notification is still being handled, and as the app drains
+        the whole queue on each notification, this item will be retrieved
+        with them.
+
         :param bytes raw: raw data
         :param object parsed: parsed message
         """
 
-        if output is not None:
+        if self._writer is not None:
             # serialize sourcetable if outputting to stream
-            if isinstance(raw, list) and not isinstance(output, Queue):
+            if isinstance(raw, list) and not self._isqueue:
                 raw = self._serialize_sourcetable(raw)
-            if isinstance(output, (Serial, BufferedWriter)):
-                output.write(raw)
-            elif isinstance(output, TextIOWrapper):
-                output.write(str(parsed))
-            elif isinstance(output, Queue):
-                output.put(raw if self.__app == CLIAPP else (raw, parsed))
-            elif isinstance(output, socket.socket):
-                output.sendall(raw)
-
-        # notify any calling app that data is available
-        if self.__app is not None:
-            if hasattr(self.__app, "set_event"):
-                self.__app.set_event(NTRIP_EVENT)
+            self._writer(raw, parsed)
+
+        # notify any calling app that data is available; queue size is
+        # checked after the put, so an app draining the queue concurrently
+        # can only cause a redundant notification, never a missed one
+        if self._notify is not None:
+            if not (self._coalesce and self._isqueue) or self._output.qsize() <= 1:
+                self._notify(NTRIP_EVENT)
 
     def _app_update_status(self, status: bool, msgt: tuple = None):
         """
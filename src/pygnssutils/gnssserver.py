@@ -17,7 +17,7 @@ Created on 24 May 2022
 # pylint: disable=too-many-arguments
 
 from logging import getLogger
-from queue import Queue
+from queue import SimpleQueue
 from threading import Thread
 from time import sleep
 
@@ -82,7 +82,7 @@ class GNSSSocketServer:
             self._outport = int(outport)
             self._maxclients = int(maxclients)
             self._kwargs = kwargs
-            self._output = Queue()
+            self._output = SimpleQueue()
             self._socket_server = None
             self._streamer = None
             self._in_thread = None
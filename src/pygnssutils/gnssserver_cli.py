@@ -31,7 +31,7 @@ from pygnssutils.globals import (
     UBXSIMULATOR,
 )
 from pygnssutils.gnssserver import GNSSSocketServer
-from pygnssutils.helpers import set_common_args
+from pygnssutils.helpers import set_common_args, set_low_latency
 from pygnssutils.socketwrapper import SocketWrapper
 
 
@@ -59,7 +59,7 @@ def _setup_datastream(**kwargs):
     port = kwargs.pop("inport", None)
     sock = kwargs.pop("socket", None)
     baudrate = int(kwargs.pop("baudrate", 9600))
-    timeout = int(kwargs.pop("timeout", 3))
+    timeout = float(kwargs.pop("timeout", 3))
     encoding = kwargs.pop("encoding", ENCODE_NONE)
 
     if port is None and sock is None:
@@ -74,6 +74,7 @@ def _setup_datastream(**kwargs):
                 _run_streamer(stream, **kwargs)
         else:
             with Serial(port, baudrate, timeout=timeout) as stream:
+                set_low_latency(stream)
                 _run_streamer(stream, **kwargs)
     elif sock is not None:  # socket
         hostport = sock.split(":")
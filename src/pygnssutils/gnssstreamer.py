@@ -14,13 +14,26 @@ Created on 27 Jul 2023
 
 from collections import defaultdict
 from io import UnsupportedOperation
-from logging import getLogger
-from queue import Empty, Queue
+from logging import DEBUG, getLogger
+from queue import Empty, Full, Queue
+from sys import maxsize
 from threading import Event, Thread
 from time import time
 
-from pynmeagps import NMEAMessage, NMEAParseError
-from pyrtcm import RTCMMessage, RTCMParseError
+from pynmeagps import (
+    NMEAMessage,
+    NMEAMessageError,
+    NMEAParseError,
+    NMEAStreamError,
+    NMEATypeError,
+)
+from pyrtcm import (
+    RTCMMessage,
+    RTCMMessageError,
+    RTCMParseError,
+    RTCMStreamError,
+    RTCMTypeError,
+)
 from pyubx2 import (
     CARRSOLN,
     ERR_RAISE,
@@ -32,9 +45,11 @@ from pyubx2 import (
     UBX_PROTOCOL,
     VALCKSUM,
     UBXMessage,
+    UBXMessageError,
     UBXParseError,
     UBXReader,
-    hextable,
+    UBXStreamError,
+    UBXTypeError,
 )
 from serial import Serial
 
@@ -49,11 +64,47 @@ from pygnssutils.globals import (
     FORMAT_JSON,
     FORMAT_PARSED,
     FORMAT_PARSEDSTRING,
+    OVERFLOW_BLOCK,
+    OVERFLOW_DROP,
     VERBOSITY_MEDIUM,
 )
-from pygnssutils.helpers import format_json, set_logging
+from pygnssutils.helpers import format_json, hextable, set_logging
 
 SLEEPTIME = 1
+MSGQUEUESIZE = 1024  # max parsed messages awaiting processing
+
+FORMATTERS = (
+    (FORMAT_PARSED, lambda raw, parsed: parsed),
+    (FORMAT_BINARY, lambda raw, parsed: raw),
+    (FORMAT_HEX, lambda raw, parsed: raw.hex()),
+    (FORMAT_HEXTABLE, lambda raw, parsed: hextable(raw)),
+    (FORMAT_PARSEDSTRING, lambda raw, parsed: str(parsed)),
+    (FORMAT_JSON, lambda raw, parsed: format_json(parsed)),
+)
+"""Output format options and their associated formatting functions"""
+
+PROTOCOLS = {
+    UBXMessage: UBX_PROTOCOL,
+    NMEAMessage: NMEA_PROTOCOL,
+    RTCMMessage: RTCM3_PROTOCOL,
+}
+"""Parsed message classes and their associated protocol filter values"""
+
+PARSER_ERRORS = (
+    UBXMessageError,
+    UBXTypeError,
+    UBXParseError,
+    UBXStreamError,
+    NMEAMessageError,
+    NMEATypeError,
+    NMEAParseError,
+    NMEAStreamError,
+    RTCMMessageError,
+    RTCMParseError,
+    RTCMStreamError,
+    RTCMTypeError,
+)
+"""Errors which UBXReader may (re)raise when parsing the datastream"""
 
 
 class GNSSStreamer:
@@ -77,6 +128,42 @@ class GNSSStreamer:
     in the calling hierarchy.
     """
 
+    # fixed attribute slots avoid per-instance __dict__ lookups in the read loop
+    __slots__ = (
+        "__app",
+        "verbosity",
+        "logtofile",
+        "logger",
+        "connected",
+        "_stream",
+        "_validate",
+        "_msgmode",
+        "_parsebitfield",
+        "_outformat",
+        "_formatters",
+        "_quitonerror",
+        "_protfilter",
+        "_limit",
+        "_overflow",
+        "_outqueue",
+        "_inqueue",
+        "_outputhandler",
+        "_inputhandler",
+        "_msgfilter",
+        "_stopevent",
+        "_msgcount",
+        "_incount",
+        "_filtcount",
+        "_outcount",
+        "_errcount",
+        "_dropcount",
+        "_status",
+        "_read_thread",
+        "_process_thread",
+        "_msgqueue",
+        "_kwargs",
+    )
+
     def __init__(
         self,
         app: object,
@@ -89,6 +176,7 @@ class GNSSStreamer:
         protfilter: int = NMEA_PROTOCOL | UBX_PROTOCOL | RTCM3_PROTOCOL,
         msgfilter: str = "",
         limit: int = 0,
+        overflow: int = OVERFLOW_BLOCK,
         outqueue: Queue = None,
         inqueue: Queue = None,
         outputhandler: object = None,
@@ -115,6 +203,8 @@ class GNSSStreamer:
             e.g. 'NAV-PVT,GNGSA'. A periodicity clause can be added e.g. NAV-SAT(10), signifying \
                 the minimum period in seconds between successive messages of this type ("")
         :param int limit: maximum number of messages to read (0 = unlimited)
+        :param int overflow: action if output processing falls behind input, \
+            0 = reader waits, 1 = reader discards messages (0)
         :param Queue outqueue: queue for data from datastream (None)
         :param Queue inqueue: queue for data to datastream (None)
         :param object outputhandler: output callback function (`do_output()`)
@@ -144,20 +234,22 @@ class GNSSStreamer:
             self._outformat = int(outformat)
             if not 0 < self._outformat < 64:
                 raise ParameterError(f"format {self._outformat} cannot exceed 63")
+            # resolve selected output formats once rather than per message
+            self._formatters = tuple(
+                fmt for opt, fmt in FORMATTERS if self._outformat & opt
+            )
             self._quitonerror = int(quitonerror)
             self._protfilter = int(protfilter)
             self._limit = int(limit)
-            self._protfilter = int(protfilter)
+            self._overflow = int(overflow)
+            if self._overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP):
+                raise ParameterError(f"overflow {self._overflow} must be 0 or 1")
             self._outqueue = outqueue
             self._inqueue = inqueue
-            if outputhandler is None:
-                self._outputhandler = self.do_output
-            else:
-                self._outputhandler = outputhandler
-            if inputhandler is None:
-                self._inputhandler = self.do_input
-            else:
-                self._inputhandler = inputhandler
+            self._outputhandler = (
+                self.do_output if outputhandler is None else outputhandler
+            )
+            self._inputhandler = self.do_input if inputhandler is None else inputhandler
             self._msgfilter = self._init_msgfilter(msgfilter)
             if stopevent is None:
                 self._stopevent = Event()
@@ -168,6 +260,7 @@ class GNSSStreamer:
             self._filtcount = defaultdict(int)
             self._outcount = defaultdict(int)
             self._errcount = 0
+            self._dropcount = 0
             self.connected = DISCONNECTED
             self._status = {
                 "fix": "NO FIX",
@@ -181,6 +274,8 @@ class GNSSStreamer:
                 "diffage": 0,
             }
             self._read_thread = None
+            self._process_thread = None
+            self._msgqueue = None
             self._kwargs = kwargs
 
         except ValueError as err:
@@ -195,18 +290,21 @@ class GNSSStreamer:
         Format is {identity: (min period, last received time)}
 
         :param str msgfilt: message filter as string
-        :returns: msgfilter as dict, or None if empty
+        :returns: msgfilter as dict (empty if no filter)
         :rtype: dict
         """
 
-        if msgfilts in ("", None):
-            return None
         msgfilter = {}
+        if msgfilts in ("", None):
+            return msgfilter
         mfparts = msgfilts.split(",")
         for msg in mfparts:
+            msg = msg.strip()
+            if msg == "":
+                continue
             filt = msg.strip(")").split("(")
             if len(filt) == 2:  # identity & period filter
-                msgfilter[filt[0]] = (float(filt[1]), 0)
+                msgfilter[filt[0].strip()] = (float(filt[1]), 0)
             else:  # identity filter
                 msgfilter[filt[0]] = (0, 0)
         return msgfilter
@@ -236,18 +334,31 @@ class GNSSStreamer:
         self.logger.info(f"Starting GNSS reader/writer using {self._stream}...")
         self.connected = CONNECTED
         self._stopevent.clear()
+        # bounded queue between reader (producer) and processor (consumer)
+        self._msgqueue = Queue(maxsize=MSGQUEUESIZE)
 
+        self._process_thread = Thread(
+            target=self._process_loop,
+            args=(
+                self._msgqueue,
+                self._stopevent,
+                self._outqueue,
+                self._kwargs,
+            ),
+            daemon=True,
+        )
         self._read_thread = Thread(
             target=self._read_loop,
             args=(
                 self._stream,
+                self._msgqueue,
                 self._stopevent,
-                self._outqueue,
                 self._inqueue,
                 self._kwargs,
             ),
             daemon=True,
         )
+        self._process_thread.start()
         self._read_thread.start()
 
     def stop(self):
@@ -262,25 +373,30 @@ class GNSSStreamer:
             f"Messages filtered: {dict(sorted(self._filtcount.items()))}\n"
             f"Messages output:   {dict(sorted(self._outcount.items()))}\n"
             f"Streaming terminated, {self._msgcount:,} messages "
-            f"processed with {self._errcount:,} errors."
+            f"processed with {self._errcount:,} errors "
+            f"and {self._dropcount:,} dropped."
         )
 
     def _read_loop(
         self,
         stream: Serial,
+        msgqueue: Queue,
         stopevent: Event,
-        outqueue: Queue,
         inqueue: Queue,
         kwargs: dict,
     ):
         """
         THREADED
-        Reads and parses incoming GNSS data from the receiver,
-        and sends any queued output data to the receiver.
+        Reads and parses incoming GNSS data from the receiver and
+        passes it to the processing thread via the message queue,
+        and sends any queued input data to the receiver.
+
+        Filtering, formatting and output are done in the processing
+        thread, so that these do not hold up reading from the receiver.
 
         :param Serial stream: serial stream
+        :param Queue msgqueue: queue for parsed messages to be processed
         :param Event stopevent: stop event
-        :param Queue outqueue: queue for messages from receiver
         :param Queue inqueue: queue for messages to send to receiver
         :param dict kwargs: user-defined keyword arguments
         """
@@ -292,46 +408,142 @@ class GNSSStreamer:
             quitonerror=self._quitonerror,
             parsebitfield=self._parsebitfield,
         )
+        # the default input handler has nothing to do without an input queue
+        nullin = self._inputhandler is self.do_input and inqueue is None
         while not stopevent.is_set():
             try:
 
-                raw_data, parsed_data = ubr.read()
-                if raw_data is None or parsed_data is None:
-                    stopevent.set()
-                    break  # EOF
-                self._incount[parsed_data.identity] += 1
-                self._get_status(parsed_data)
-                # check if message passes filter
-                if self._filtered(parsed_data):
-                    self._filtcount[parsed_data.identity] += 1
+                # iteration ends at EOF; the outer loop re-enters
+                # the iterator after any recoverable parse error
+                for raw_data, parsed_data in ubr:
+                    if not self._enqueue(msgqueue, (raw_data, parsed_data), stopevent):
+                        break
+
+                    # send any data from input handler to receiver
+                    if not nullin:
+                        self._inputhandler(
+                            ubr.datastream, inqueue, logger=self.logger, **kwargs
+                        )
                 else:
-                    # format data
-                    formatted = self._formatted(raw_data, parsed_data, self._outformat)
-                    # send filtered and formatted data to output handler
-                    self._msgcount += 1
-                    self._outcount[parsed_data.identity] += 1
-                    self._outputhandler(
-                        raw_data, formatted, outqueue, logger=self.logger, **kwargs
-                    )
-                if self._limit and self._msgcount >= self._limit:
-                    self.logger.info(f"Message limit {self._limit} reached.")
-                    stopevent.set()
+                    self._enqueue(msgqueue, None, stopevent)  # EOF
                     break
 
-                # send any data from input handler to receiver
-                self._inputhandler(
-                    ubr.datastream, inqueue, logger=self.logger, **kwargs
-                )
-
             except ParameterError as err:
                 raise ParameterError() from err
             except OSError:  # thread terminated while reading
                 break
-            except (NMEAParseError, UBXParseError, RTCMParseError) as err:
+            except PARSER_ERRORS as err:
                 self._errcount += 1
                 self.logger.error(f"Error parsing data stream {err}")
                 continue
 
+    def _enqueue(self, msgqueue: Queue, item: object, stopevent: Event) -> bool:
+        """
+        Put item on message queue, blocking while the queue is
+        full unless and until streaming is stopped. If the overflow
+        policy is OVERFLOW_DROP, messages are instead discarded while
+        the queue is full (the EOF sentinel is never discarded).
+
+        :param Queue msgqueue: message queue
+        :param object item: (raw, parsed) tuple, or None for EOF
+        :param Event stopevent: stop event
+        :returns: True if queued or dropped, False if streaming stopped
+        :rtype: bool
+        """
+
+        if self._overflow == OVERFLOW_DROP and item is not None:
+            try:
+                msgqueue.put_nowait(item)
+            except Full:
+                self._dropcount += 1
+            return not stopevent.is_set()
+
+        while not stopevent.is_set():
+            try:
+                msgqueue.put(item, timeout=SLEEPTIME)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _process_loop(
+        self,
+        msgqueue: Queue,
+        stopevent: Event,
+        outqueue: Queue,
+        kwargs: dict,
+    ):
+        """
+        THREADED
+        Filters and formats parsed GNSS data from the message queue
+        and sends it to the output handler. Stops streaming on EOF,
+        on reaching the message limit, or if the output handler fails.
+
+        :param Queue msgqueue: queue for parsed messages to be processed
+        :param Event stopevent: stop event
+        :param Queue outqueue: queue for messages from receiver
+        :param dict kwargs: user-defined keyword arguments
+        """
+
+        # 0 = unlimited, so substitute a sentinel which is never reached
+        limit = self._limit if self._limit else maxsize
+        # with the default output handler and no output queue, formatted
+        # data is only consumed by debug logging, so is otherwise not built
+        if self._outputhandler is self.do_output and outqueue is None:
+            formatter = None
+        else:
+            formatter = self._get_formatter()
+        try:
+            while not stopevent.is_set():
+                try:
+                    item = msgqueue.get(timeout=SLEEPTIME)
+                except Empty:
+                    continue
+                if item is None:  # EOF
+                    break
+                if self._process_message(item, formatter, outqueue, kwargs) >= limit:
+                    self.logger.info(f"Message limit {limit} reached.")
+                    break
+        finally:
+            stopevent.set()
+
+    def _process_message(
+        self, item: tuple, formatter: object, outqueue: Queue, kwargs: dict
+    ) -> int:
+        """
+        Filter and format a single parsed message and send it
+        to the output handler.
+
+        :param tuple item: (raw, parsed) message tuple
+        :param object formatter: formatting function, or None if \
+            formatted data is only consumed by debug logging
+        :param Queue outqueue: queue for messages from receiver
+        :param dict kwargs: user-defined keyword arguments
+        :returns: number of messages output so far
+        :rtype: int
+        """
+
+        raw_data, parsed_data = item
+        identity = parsed_data.identity
+        self._incount[identity] += 1
+        self._get_status(parsed_data)
+        # check if message passes filter
+        if self._filtered(parsed_data):
+            self._filtcount[identity] += 1
+            return self._msgcount
+        # format data
+        if formatter is not None:
+            formatted = formatter(raw_data, parsed_data)
+        elif self.logger.isEnabledFor(DEBUG):
+            formatted = self._formatted(raw_data, parsed_data)
+        else:
+            formatted = []
+        # send filtered and formatted data to output handler
+        self._msgcount += 1
+        self._outcount[identity] += 1
+        self._outputhandler(raw_data, formatted, outqueue, logger=self.logger, **kwargs)
+        return self._msgcount
+
     def _get_status(self, parsed_data: object):
         """
         Extract current navigation status data from NMEA or UBX message.
@@ -339,6 +551,11 @@ class GNSSStreamer:
         :param object parsed_data: parsed NMEA or UBX navigation message
         """
 
+        # parsed message attributes are held in the instance dict, so test
+        # membership directly rather than via hasattr(), which raises and
+        # catches an AttributeError internally for every absent attribute
+        attrs = parsed_data.__dict__
+        status = self._status
         for attr in (
             "lat",
             "lon",
@@ -349,30 +566,26 @@ class GNSSStreamer:
             "diffAge",
             "diffStation",
         ):
-            if hasattr(parsed_data, attr):
-                self._status[attr] = getattr(parsed_data, attr)
-        if hasattr(parsed_data, "numSV"):
-            self._status["sip"] = parsed_data.numSV
-        if hasattr(parsed_data, "fixType"):
-            self._status["fix"] = FIXTYPE.get(parsed_data.fixType, "NO FIX")
-        if hasattr(parsed_data, "carrSoln"):
-            if parsed_data.carrSoln != 0:  # NO RTK
-                self._status["fix"] = (
-                    f"{CARRSOLN.get(parsed_data.carrSoln, self._status['fix'])}"
-                )
-        if hasattr(parsed_data, "quality"):
-            self._status["fix"] = FIXTYPE_GGA.get(parsed_data.quality, "NO FIX")
-        if hasattr(parsed_data, "lastCorrectionAge"):
-            self._status["diffage"] = LASTCORRECTIONAGE.get(
-                parsed_data.lastCorrectionAge, 0
-            )
-        if hasattr(parsed_data, "hMSL"):  # UBX hMSL is in mm
-            self._status["alt"] = parsed_data.hMSL / 1000
-        if hasattr(parsed_data, "hMSL") and hasattr(parsed_data, "height"):
-            self._status["sep"] = (parsed_data.height - parsed_data.hMSL) / 1000
-        if hasattr(parsed_data, "hAcc"):  # UBX hAcc is in mm
+            if attr in attrs:
+                status[attr] = attrs[attr]
+        if "numSV" in attrs:
+            status["sip"] = attrs["numSV"]
+        if "fixType" in attrs:
+            status["fix"] = FIXTYPE.get(attrs["fixType"], "NO FIX")
+        if "carrSoln" in attrs:
+            if attrs["carrSoln"] != 0:  # NO RTK
+                status["fix"] = f"{CARRSOLN.get(attrs['carrSoln'], status['fix'])}"
+        if "quality" in attrs:
+            status["fix"] = FIXTYPE_GGA.get(attrs["quality"], "NO FIX")
+        if "lastCorrectionAge" in attrs:
+            status["diffage"] = LASTCORRECTIONAGE.get(attrs["lastCorrectionAge"], 0)
+        if "hMSL" in attrs:  # UBX hMSL is in mm
+            status["alt"] = attrs["hMSL"] / 1000
+            if "height" in attrs:
+                status["sep"] = (attrs["height"] - attrs["hMSL"]) / 1000
+        if "hAcc" in attrs:  # UBX hAcc is in mm
             unit = 1 if parsed_data.identity == "PUBX00" else 1000
-            self._status["hacc"] = parsed_data.hAcc / unit
+            status["hacc"] = attrs["hAcc"] / unit
 
     def _filtered(self, parsed_data: object) -> bool:
         """
@@ -385,58 +598,63 @@ class GNSSStreamer:
         :rtype: bool
         """
 
-        ident = parsed_data.identity
-        if isinstance(parsed_data, UBXMessage):
-            protocol = UBX_PROTOCOL
-        elif isinstance(parsed_data, NMEAMessage):
-            protocol = NMEA_PROTOCOL
-        elif isinstance(parsed_data, RTCMMessage):
-            protocol = RTCM3_PROTOCOL
-        else:
+        # protocol check comes first, so identity is only looked
+        # up for messages which pass the protocol filter
+        protocol = PROTOCOLS.get(type(parsed_data), None)
+        if protocol is None:  # e.g. subclass of a known message class
+            protocol = 0
+            for cls, prot in PROTOCOLS.items():
+                if isinstance(parsed_data, cls):
+                    protocol = prot
+                    break
+        if not self._protfilter & protocol:
             return True
 
-        if self._protfilter & protocol:
-            if self._msgfilter is None:
-                return False
+        msgfilter = self._msgfilter
+        if not msgfilter:
+            return False
 
-            if ident in self._msgfilter:
-                per, tic = self._msgfilter[ident]
-                if per == 0:  # no period filter
-                    return False
-                toc = time()
-                elapsed = toc - tic
-                # check if at least 95% of filter period has elapsed
-                if elapsed >= 0.95 * per:
-                    self._msgfilter[ident] = (per, toc)
-                    return False
+        ident = parsed_data.identity
+        filt = msgfilter.get(ident, None)  # single hash lookup
+        if filt is not None:
+            per, tic = filt
+            if per == 0:  # no period filter
+                return False
+            toc = time()
+            elapsed = toc - tic
+            # check if at least 95% of filter period has elapsed
+            if elapsed >= 0.95 * per:
+                msgfilter[ident] = (per, toc)
+                return False
 
         return True
 
-    def _formatted(self, raw_data: bytes, parsed_data: object, outformat: int) -> list:
+    def _formatted(self, raw_data: bytes, parsed_data: object) -> list:
         """
-        Format output data.
+        Format output data using the formatting functions
+        selected at initialisation.
 
         :param bytes raw_data: raw data
         :param object parsed_data: parsed data
-        :param int outformat: OR'd format options
         :returns: list of data objects in selected formats
         :rtype: list
         """
 
-        formatted = []
-        if outformat & FORMAT_PARSED:
-            formatted.append(parsed_data)
-        if outformat & FORMAT_BINARY:
-            formatted.append(raw_data)
-        if outformat & FORMAT_HEX:
-            formatted.append(raw_data.hex())
-        if outformat & FORMAT_HEXTABLE:
-            formatted.append(hextable(raw_data))
-        if outformat & FORMAT_PARSEDSTRING:
-            formatted.append(str(parsed_data))
-        if outformat & FORMAT_JSON:
-            formatted.append(format_json(parsed_data))
-        return formatted
+        return [fmt(raw_data, parsed_data) for fmt in self._formatters]
+
+    def _get_formatter(self) -> object:
+        """
+        Get function to format output data, specialised for the
+        common case where only a single output format is selected.
+
+        :returns: formatting function f(raw_data, parsed_data) -> list
+        :rtype: object
+        """
+
+        if len(self._formatters) == 1:
+            fmt = self._formatters[0]
+            return lambda raw_data, parsed_data: [fmt(raw_data, parsed_data)]
+        return self._formatted
 
     def get_coordinates(self) -> dict:
         """
@@ -488,7 +706,9 @@ class GNSSStreamer:
 
         ld = len(formatted_data)
         logger = kwargs.get("logger", None)
-        if logger is not None:
+        # check level first, as formatting the log message would
+        # otherwise stringify every parsed message even if not logged
+        if logger is not None and logger.isEnabledFor(DEBUG):
             for i, data in enumerate(formatted_data):
                 logger.debug(f"Formatted data output ({i+1} of {ld}):\n{data}")
         if outqueue is not None:
@@ -510,6 +730,8 @@ class GNSSStreamer:
 
         logger = kwargs.get("logger", None)
         if inqueue is not None:
+            # resolve level once, so log message is only built if it is logged
+            debug = logger is not None and logger.isEnabledFor(DEBUG)
             try:
                 while not inqueue.empty():
                     data = inqueue.get(False)
@@ -517,13 +739,13 @@ class GNSSStreamer:
                         raw, _ = data
                     else:  # just raw
                         raw = data
-                    if logger is not None:
+                    if debug:
                         logger.debug(f"Data input: {data}")
                     datastream.write(raw)
                     inqueue.task_done()
             except Empty:
                 pass
-            except UnsupportedOperation as err:
+            except (UnsupportedOperation, TypeError) as err:  # e.g. read-only mmap
                 msg = f"Datastream does not support write operations {datastream} {err}"
                 if logger is not None:
                     logger.critical(msg)
@@ -28,13 +28,14 @@ Created on 24 Jul 2024
 :license: BSD 3-Clause
 """
 
+import mmap
+import sys
 from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
 from io import BufferedWriter, TextIOWrapper
 from queue import Queue
-from socket import create_connection, gethostbyname, socket
+from socket import AF_INET, SOCK_STREAM, gethostbyname, socket
 from threading import Event, Thread
 from time import sleep
-from types import FunctionType
 
 from pyubx2 import ERR_LOG, SETPOLL, UBXReader
 from pyubxutils.ubxsimulator import UBXSimulator
@@ -68,16 +69,63 @@ from pygnssutils.globals import (
     OUTPUT_SERIAL,
     OUTPUT_SOCKET,
     OUTPUT_TEXT_FILE,
+    OVERFLOW_BLOCK,
+    OVERFLOW_DROP,
     UBXSIMULATOR,
 )
 from pygnssutils.gnssmqttclient import GNSSMQTTClient
 from pygnssutils.gnssntripclient import GNSSNTRIPClient
 from pygnssutils.gnssstreamer import GNSSStreamer
-from pygnssutils.helpers import parse_url, set_common_args
+from pygnssutils.helpers import (
+    parse_url,
+    set_common_args,
+    set_low_latency,
+    set_socket_options,
+)
 from pygnssutils.socket_server import runserver
 from pygnssutils.socketwrapper import SocketWrapper
 
 STATUSINTERVAL = 5
+OUTFILEBUFFER = 1048576  # output file write buffer size in bytes
+INFILEBUFFER = 1048576  # input file read buffer size in bytes
+SOCKETBUFFER = 65536  # input socket read size in bytes
+FILESWITCHINTERVAL = 0.05  # thread switch interval in seconds for file input
+
+
+def _setup_writer(output: object) -> object:
+    """
+    Resolve the write function for the specified output channel, so that
+    the output type need only be determined once rather than per message.
+
+    The write function takes the list of formatted data for a message.
+    Stream outputs receive the whole list in a single write, so selecting
+    multiple output formats does not multiply the number of writes.
+
+    :param object output: output channel (serial, file, queue, socket, \
+        callable e.g. lambda expression, or None for terminal)
+    :returns: write function f(lines)
+    :rtype: object
+    """
+
+    if isinstance(output, (Serial, BufferedWriter)):
+        return lambda lines: output.write(b"".join(lines))
+    if isinstance(output, TextIOWrapper):
+        return lambda lines: output.write("".join(f"{line}\n" for line in lines))
+    if isinstance(output, socket):
+        return lambda lines: output.sendall(b"".join(lines))
+    if isinstance(output, Queue):
+        write = output.put
+    elif callable(output):  # e.g. lambda expression or builtin function
+        write = output
+    else:  # terminal - write directly to stdout rather than via print()
+        write = sys.stdout.write
+        return lambda lines: write("".join(f"{line}\n" for line in lines))
+
+    def write_each(lines: list):
+        for line in lines:
+            write(line)
+
+    return write_each
 
 
 def _do_cli_output(raw_data: bytes, formatted_data: list, outqueue: Queue, **kwargs):
@@ -92,24 +140,14 @@ def _do_cli_output(raw_data: bytes, formatted_data: list, outqueue: Queue, **kwa
 
     # pylint: disable=unused-argument
 
-    output = kwargs.get("output", None)
+    writer = kwargs.get("writer", None)
+    if writer is None:
+        writer = _setup_writer(kwargs.get("output", None))
     logger = kwargs.get("logger", None)
     if logger is not None:
         logger.debug(formatted_data)
     try:
-        for line in formatted_data:
-            if isinstance(output, (Serial, BufferedWriter)):
-                output.write(line)
-            elif isinstance(output, TextIOWrapper):
-                output.write(f"{line}\n")
-            elif isinstance(output, Queue):
-                output.put(line)
-            elif isinstance(output, socket):
-                output.sendall(line)
-            elif isinstance(output, FunctionType):  # lambda expression
-                output(line)
-            else:
-                print(line)
+        writer(formatted_data)
     except TypeError as err:
         raise ParameterError(
             f"--format {kwargs.get('outformat', None)} and --output "
@@ -209,6 +247,8 @@ def _setup_input_stream(app: object, datatype: str, **kwargs) -> object:
                     break  # EOF
         except ValueError:
             pass  # null buffer, treat as EOF
+        finally:
+            stream.close()
 
     def startreader(stream: object, output: Queue):
         """
@@ -227,13 +267,15 @@ def _setup_input_stream(app: object, datatype: str, **kwargs) -> object:
     instream = kwargs.get("input", "")
     output = kwargs["inqueue"]
     try:
+        # stream is closed by reader thread when done
         if datatype == "SERIAL":  # serial port
             port, baudrate = instream.split("@")
-            with Serial(port, baudrate, timeout=5) as stream:
-                startreader(stream, output)
+            stream = Serial(port, baudrate, timeout=5)
         else:  # binary file
-            with open(instream, "rb") as stream:
-                startreader(stream, output)
+            stream = open(  # pylint: disable=consider-using-with
+                instream, "rb", buffering=INFILEBUFFER
+            )
+        startreader(stream, output)
     except (FileNotFoundError, SerialException, ValueError) as err:
         raise ParameterError(
             f"Invalid input stream descriptor '{instream}' {err}"
@@ -254,12 +296,12 @@ def _setup_output(**kwargs):
     output = kwargs.pop("output", None)
     if cliout == OUTPUT_FILE:
         filename = output
-        with open(filename, "wb") as output:
+        with open(filename, "wb", buffering=OUTFILEBUFFER) as output:
             kwargs["output"] = output
             _setup_datastream(**kwargs)
     elif cliout == OUTPUT_TEXT_FILE:
         filename = output
-        with open(filename, "w", encoding="utf-8") as output:
+        with open(filename, "w", buffering=OUTFILEBUFFER, encoding="utf-8") as output:
             kwargs["output"] = output
             _setup_datastream(**kwargs)
     elif cliout == OUTPUT_SERIAL:
@@ -280,7 +322,11 @@ def _setup_output(**kwargs):
         kwargs["output"] = output
         _setup_datastream(**kwargs)
     elif cliout == OUTPUT_HANDLER:
-        output = eval(output)  # pylint: disable=eval-used
+        # compile expression once to the handler callable, named so that
+        # any error raised by the handler is identifiable in tracebacks
+        output = eval(  # pylint: disable=eval-used
+            compile(output, "<outputhandler>", "eval")
+        )
         kwargs["output"] = output
         _setup_datastream(**kwargs)
     else:
@@ -302,7 +348,7 @@ def _setup_datastream(**kwargs):
     port = kwargs.pop("port", None)
     sock = kwargs.pop("socket", None)
     baudrate = int(kwargs.pop("baudrate", 9600))
-    timeout = int(kwargs.pop("timeout", 3))
+    timeout = float(kwargs.pop("timeout", 3))
     filename = kwargs.pop("filename", None)
     encoding = kwargs.pop("encoding", ENCODE_NONE)
 
@@ -321,6 +367,7 @@ def _setup_datastream(**kwargs):
                 _run_streamer(stream, **kwargs)
         else:
             with Serial(port, baudrate, timeout=timeout) as stream:
+                set_low_latency(stream)
                 _run_streamer(stream, **kwargs)
     elif sock is not None:  # socket
         hostport = sock.split(":")
@@ -329,13 +376,32 @@ def _setup_datastream(**kwargs):
         hostname = hostport[0]
         port = int(hostport[1])
         ip = gethostbyname(hostname)
-        with create_connection((ip, port), timeout) as sock:
+        with socket(AF_INET, SOCK_STREAM) as sock:
+            set_socket_options(sock)  # must precede connect
+            sock.settimeout(timeout)
+            sock.connect((ip, port))
             # wrap socket to allow processing as normal stream
-            stream = SocketWrapper(sock, encoding)
+            stream = SocketWrapper(sock, encoding, SOCKETBUFFER)
             _run_streamer(stream, **kwargs)
     elif filename is not None:  # binary file
-        with open(filename, "rb") as stream:
-            _run_streamer(stream, **kwargs)
+        with open(filename, "rb", buffering=INFILEBUFFER) as infile:
+            try:  # memory-map file so reads are served from page cache
+                stream = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+                # madvise constants are not available on Windows
+                sequential = getattr(mmap, "MADV_SEQUENTIAL", None)
+                if sequential is not None:
+                    stream.madvise(sequential)
+            except (ValueError, OSError):  # e.g. empty file, pipe
+                stream = infile
+            # file replay is throughput rather than latency bound, so
+            # switch the GIL between reader and processor threads less often
+            switchinterval = sys.getswitchinterval()
+            sys.setswitchinterval(FILESWITCHINTERVAL)
+            try:
+                with stream:
+                    _run_streamer(stream, **kwargs)
+            finally:
+                sys.setswitchinterval(switchinterval)
 
 
 def _run_streamer(stream, **kwargs):
@@ -354,6 +420,7 @@ def _run_streamer(stream, **kwargs):
     kwargs["inqueue"] = inqueue  # gnssstreamer input
     # kwargs["output"] = inqueue  # gnssntripclient output
     kwargs["outputhandler"] = _do_cli_output
+    kwargs["writer"] = _setup_writer(kwargs.get("output", None))
     cliinput = int(kwargs.get("cliinput", INPUT_NONE))
 
     try:
@@ -376,6 +443,8 @@ def _run_streamer(stream, **kwargs):
 
     except KeyboardInterrupt:
         stopevent.set()
+    finally:
+        sys.stdout.flush()
 
 
 def main():
@@ -497,6 +566,17 @@ def main():
         type=int,
         default=0,
     )
+    ap.add_argument(
+        "--overflow",
+        required=False,
+        help=(
+            "Action if output cannot keep up with input "
+            f"{OVERFLOW_BLOCK} = wait, {OVERFLOW_DROP} = discard messages"
+        ),
+        type=int,
+        choices=[OVERFLOW_BLOCK, OVERFLOW_DROP],
+        default=OVERFLOW_BLOCK,
+    )
     ap.add_argument(
         "--clioutput",
         required=False,
@@ -13,18 +13,39 @@ Created on 26 May 2022
 import logging
 import logging.handlers
 from argparse import ArgumentParser
+from json import JSONEncoder
 from math import cos, radians, sin
 from os import getenv
-from socket import AF_INET, AF_INET6, gaierror, getaddrinfo
+from socket import (
+    AF_INET,
+    AF_INET6,
+    IPPROTO_TCP,
+    SO_KEEPALIVE,
+    SO_RCVBUF,
+    SOL_SOCKET,
+    TCP_NODELAY,
+    gaierror,
+    getaddrinfo,
+    socket,
+)
+
+try:
+    from socket import TCP_KEEPCNT, TCP_KEEPIDLE, TCP_KEEPINTVL
+except ImportError:  # not available on all platforms
+    TCP_KEEPCNT = TCP_KEEPIDLE = TCP_KEEPINTVL = None
 
 from pynmeagps import haversine
 from pyubx2 import itow2utc
 
 from pygnssutils.exceptions import ParameterError
 from pygnssutils.globals import (
+    KEEPALIVE_COUNT,
+    KEEPALIVE_IDLE,
+    KEEPALIVE_INTERVAL,
     LOGFORMAT,
     LOGGING_LEVELS,
     LOGLIMIT,
+    SOCKET_RCVBUF,
     VERBOSITY_CRITICAL,
     VERBOSITY_DEBUG,
     VERBOSITY_HIGH,
@@ -32,6 +53,36 @@ from pygnssutils.globals import (
     VERBOSITY_MEDIUM,
 )
 
+LOGHANDLERS = {}  # file log handlers keyed on (log file name, level, size limit)
+JSONSTR = JSONEncoder(ensure_ascii=False).encode  # JSON string value encoder
+
+
+class CachedTimeFormatter(logging.Formatter):
+    """
+    Logging formatter which renders the record timestamp at most once
+    per second, rather than once per log record. Sub-second precision
+    is provided separately via the `msecs` record attribute.
+    """
+
+    _cached = (None, "")  # (time in whole seconds, formatted time)
+
+    def formatTime(self, record: logging.LogRecord, datefmt: str = None) -> str:
+        """
+        Overridden formatTime method.
+
+        :param logging.LogRecord record: log record
+        :param str datefmt: date format
+        :returns: formatted time
+        :rtype: str
+        """
+
+        secs = int(record.created)
+        cached = self._cached
+        if cached[0] != secs:
+            cached = (secs, super().formatTime(record, datefmt))
+            self._cached = cached  # single assignment is thread-safe
+        return cached[1]
+
 
 def parse_config(configfile: str) -> dict:
     """
@@ -142,6 +193,13 @@ def set_logging(
     :param str logtofile: fully qualified log file name ("")
     :param str logform: logging format (datetime - level - name)
     :param int limit: maximum logfile size in bytes (10MB)
+
+    Loggers writing to the same log file at the same level and size limit
+    share a single open file handler, rather than each opening its own
+    handle on the file.
+
+    The logger's own level is set to the verbosity level, so that
+    isEnabledFor() checks in calling code reflect the selected verbosity.
     """
 
     try:
@@ -149,8 +207,8 @@ def set_logging(
     except (KeyError, ValueError):
         level = logging.WARNING
 
-    logger.setLevel(logging.DEBUG)
-    logformat = logging.Formatter(
+    logger.setLevel(level)
+    logformat = CachedTimeFormatter(
         logform,
         datefmt="%Y-%m-%d %H:%M:%S",
         style="{",
@@ -158,9 +216,13 @@ def set_logging(
     if logtofile == "":
         loghandler = logging.StreamHandler()
     else:
-        loghandler = logging.handlers.RotatingFileHandler(
-            logtofile, mode="a", maxBytes=limit, backupCount=10, encoding="utf-8"
-        )
+        key = (logtofile, level, limit)
+        loghandler = LOGHANDLERS.get(key, None)
+        if loghandler is None:
+            loghandler = logging.handlers.RotatingFileHandler(
+                logtofile, mode="a", maxBytes=limit, backupCount=10, encoding="utf-8"
+            )
+            LOGHANDLERS[key] = loghandler
     loghandler.setFormatter(logformat)
     loghandler.setLevel(level)
     logger.addHandler(loghandler)
@@ -234,22 +296,62 @@ def find_mp_distance(
 
     mindist = 9999999
     mpname = None
-    for mp in sourcetable:
-        dist = get_mp_distance(lat, lon, mp)
-        if dist is not None:
-            if name == "":  # find closest
-                if dist < mindist:
-                    mpname = mp[0]
-                    mindist = dist
-            else:
-                if mp[0] == name:
-                    mpname = mp[0]
-                    mindist = dist
-                    break
+    if name != "":  # only need distance to named mountpoint
+        for mp in sourcetable:
+            if len(mp) > 9 and mp[0] == name:
+                dist = get_mp_distance(lat, lon, mp)
+                if dist is not None:
+                    return mp[0], round(dist, 2)
+        return mpname, round(mindist, 2)
+
+    try:
+        closest = find_closest_mp(float(lat), float(lon), sourcetable)
+    except (TypeError, ValueError):
+        closest = None
+    if closest is not None:
+        mpname = closest[0]
+        mindist = get_mp_distance(lat, lon, closest)
 
     return mpname, round(mindist, 2)
 
 
+def find_closest_mp(lat: float, lon: float, sourcetable: list) -> list:
+    """
+    Find closest mountpoint in sourcetable, without calculating
+    the full haversine distance to every mountpoint.
+
+    Haversine distance is a decreasing function of its acos() argument,
+    so the closest mountpoint is the one with the largest argument. The
+    reference coordinate terms of the argument are calculated only once.
+
+    :param float lat: reference latitude
+    :param float lon: reference longitude
+    :param list sourcetable: sourcetable as list
+    :returns: closest sourcetable mountpoint entry, or None if n/a
+    :rtype: list or None
+    """
+
+    phi1 = radians(lat)
+    lambda1 = radians(lon)
+    cosphi1 = cos(phi1)
+    closest = None
+    maxarg = -1.0
+    for mp in sourcetable:
+        try:
+            if len(mp) <= 9:  # no location provided for this mountpoint
+                continue
+            phi2 = radians(float(mp[8]))
+            lambda2 = radians(float(mp[9]))
+        except (TypeError, ValueError):
+            continue
+        arg = cos(phi2 - phi1) - cosphi1 * cos(phi2) * (1 - cos(lambda2 - lambda1))
+        if -1.0 <= arg <= 1.0 and (closest is None or arg > maxarg):
+            maxarg = arg
+            closest = mp
+
+    return closest
+
+
 def cel2cart(elevation: float, azimuth: float) -> tuple:
     """
     Convert celestial coordinates (degrees) to Cartesian coordinates.
@@ -281,25 +383,65 @@ def format_json(message: object) -> str:
     if hasattr(message, "identity"):
         ident = message.identity
 
-    sta = "{"
-    end = "}"
-    stg = f'{sta}"type": "{type(message)}", "identity": "{ident}", "payload": {sta}'
-    for i, att in enumerate(message.__dict__):
+    # build list of attribute fragments and join once,
+    # rather than repeatedly concatenating the document
+    atts = []
+    for att, val in message.__dict__.items():
         if att[0] != "_":  # only format public attributes
-            val = message.__dict__[att]
             if att == "iTOW":  # convert UBX iTOW to UTC
                 val = itow2utc(val)
             if isinstance(val, bool):
-                stg += f'"{att}": {"true" if val else "false"}'
+                atts.append(f'"{att}": {"true" if val else "false"}')
             elif isinstance(val, (int, float)):
-                stg += f'"{att}": {val}'
+                atts.append(f'"{att}": {val}')
             else:
-                stg += f'"{att}": "{str(val)}"'
-            if i < len(message.__dict__) - 1:
-                stg += ", "
-    stg += f"{end}{end}"
+                atts.append(f'"{att}": {JSONSTR(str(val))}')
 
-    return stg
+    return (
+        f'{{"type": "{type(message)}", "identity": "{ident}", '
+        f'"payload": {{{", ".join(atts)}}}}}'
+    )
+
+
+def set_low_latency(stream: object):
+    """
+    Set serial port to low latency mode where supported (Linux),
+    so that received data is passed to the reader immediately
+    rather than after the tty layer's scheduling delay.
+    Ignored if not supported by the platform or device.
+
+    :param object stream: serial stream
+    """
+
+    try:
+        stream.set_low_latency_mode(True)
+    except (AttributeError, OSError, ValueError):
+        pass
+
+
+def hextable(raw: bytes, cols: int = 8) -> str:
+    """
+    Formats raw (binary) message in tabular hexadecimal format e.g.
+
+    000: 2447 4e47 5341 2c41 2c33 2c33 342c 3233  | b'$GNGSA,A,3,34,23' |
+
+    Output is identical to `pyubx2.hextable()`, but each row is
+    converted with a single `bytes.hex()` call rather than by
+    slicing and concatenating the hex string column by column.
+
+    :param bytes raw: raw (binary) data
+    :param int cols: number of columns in hex table (8)
+    :returns: table of hex data
+    :rtype: str
+    """
+
+    rowlen = cols * 2  # bytes per row
+    colw = cols * 5  # 4 hex digits plus separator per column
+    rows = []
+    for i in range(0, len(raw), rowlen):
+        row = bytes(raw[i : i + rowlen])  # slice once per row
+        rows.append(f"{i:03}: {row.hex(' ', -2):<{colw}} | {row!s:<67} |\n")
+    return "".join(rows)
 
 
 def format_conn(
@@ -361,6 +503,62 @@ def ipprot2str(family: int) -> str:
     return "IPv4"
 
 
+def set_socket_options(sock: socket, rcvbuf: int = SOCKET_RCVBUF):
+    """
+    Tune TCP socket for streaming GNSS data - enlarge the receive
+    buffer and disable Nagle buffering of (small) outgoing messages.
+
+    Should be called before the socket is connected, as the receive
+    buffer size determines the TCP window negotiated on connection.
+    Options not supported by the platform are ignored.
+
+    :param socket sock: TCP socket
+    :param int rcvbuf: receive buffer size in bytes (4MB)
+    """
+
+    for level, opt, val in (
+        (SOL_SOCKET, SO_RCVBUF, rcvbuf),
+        (IPPROTO_TCP, TCP_NODELAY, 1),
+    ):
+        try:
+            sock.setsockopt(level, opt, val)
+        except OSError:
+            pass
+
+
+def set_keepalive(
+    sock: socket,
+    idle: int = KEEPALIVE_IDLE,
+    interval: int = KEEPALIVE_INTERVAL,
+    count: int = KEEPALIVE_COUNT,
+):
+    """
+    Enable TCP keepalive on long-lived socket, so that a half-open
+    connection is detected by the OS rather than left blocking reads
+    until any application-level timeout.
+
+    Keepalive timings are only set where supported by the platform.
+
+    :param socket sock: TCP socket
+    :param int idle: idle time in seconds before first probe (30)
+    :param int interval: interval between probes in seconds (10)
+    :param int count: unanswered probes before connection is dropped (3)
+    """
+
+    for level, opt, val in (
+        (SOL_SOCKET, SO_KEEPALIVE, 1),
+        (IPPROTO_TCP, TCP_KEEPIDLE, idle),
+        (IPPROTO_TCP, TCP_KEEPINTVL, interval),
+        (IPPROTO_TCP, TCP_KEEPCNT, count),
+    ):
+        if opt is None:
+            continue
+        try:
+            sock.setsockopt(level, opt, val)
+        except OSError:
+            pass
+
+
 def gtype(data: object) -> str:
     """
     Get type of GNSS data as user-friendly string.
@@ -36,7 +36,7 @@ from base64 import b64encode
 from datetime import datetime, timezone
 from logging import getLogger
 from os import getenv
-from queue import Queue
+from queue import Empty, Queue, SimpleQueue
 from socketserver import StreamRequestHandler, ThreadingTCPServer
 from threading import Event, Thread
 
@@ -58,6 +58,7 @@ RTCM = b"rtcm"
 SRT = b"srt"
 BAD = b"bad"
 BUFSIZE = 1024
+MAXBATCH = 65536  # max bytes written to client socket in a single write
 PYGPSMP = "pygnssutils"
 
 
@@ -102,10 +103,11 @@ class SocketServer(ThreadingTCPServer):
             "ntrippassword", getenv(ENV_NTRIP_PASSWORD, "password")
         )
         self.address_family = ipprot2int(kwargs.pop("ipprot", "IPv4"))
-        # set up pool of client queues
+        # set up pool of client queues; these are only ever put to and
+        # got from, so SimpleQueue avoids Queue's condition bookkeeping
         self.clientqueues = []
         for _ in range(self._maxclients):
-            self.clientqueues.append({"client": None, "queue": Queue()})
+            self.clientqueues.append({"client": None, "queue": SimpleQueue()})
         self._start_read_thread()
         self.daemon_threads = True  # stops deadlock on abrupt termination
         super().__init__(*args, **kwargs)
@@ -501,12 +503,28 @@ class ClientHandler(StreamRequestHandler):
     def _write_from_mq(self):
         """
         Get data from message queue and write to socket.
+
+        Blocks until at least one message is available, then drains
+        any further messages already queued (up to MAXBATCH bytes) so
+        they go out in a single write rather than one write per message.
         """
 
+        batch = []
+        size = 0
         raw = self._msgqueue.get()
-        if raw is not None:
-            self.wfile.write(raw)
-            self.wfile.flush()
+        while True:
+            if raw is not None:
+                batch.append(raw)
+                size += len(raw)
+            if size >= MAXBATCH:
+                break
+            try:
+                raw = self._msgqueue.get_nowait()
+            except Empty:
+                break
+        if batch:
+            # wfile is unbuffered, so send directly on the socket
+            self.request.sendall(b"".join(batch))
 
 
 def runserver(
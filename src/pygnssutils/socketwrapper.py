@@ -35,7 +35,13 @@ class SocketWrapper:
     Supports chunked transfer-encoded datastreams.
     """
 
-    def __init__(self, sock: socket, encoding=ENCODE_NONE, bufsize=DEFAULT_BUFSIZE):
+    def __init__(
+        self,
+        sock: socket,
+        encoding=ENCODE_NONE,
+        bufsize=DEFAULT_BUFSIZE,
+        data: bytes = b"",
+    ):
         """
         Constructor.
 
@@ -43,6 +49,8 @@ class SocketWrapper:
         :param int encoding: OR'd transfer-encoding values \
             - 0 = none, 1 = chunk, 2 = gzip, 4 = compress, 8 = deflate
         :param int bufsize: internal buffer size
+        :param bytes data: any data already read from socket \
+            e.g. alongside HTTP response header (b"")
         """
 
         # configure logger with name "pygnssutils" in calling module
@@ -51,8 +59,13 @@ class SocketWrapper:
         self._bufsize = bufsize
         self._encoding = encoding
         self._buffer = bytearray()
+        # reusable receive buffer, to avoid allocating bytes for every recv
+        self._recvbuf = memoryview(bytearray(bufsize))
         self._partial = b""  # partial chunk
-        self._recv()  # populate initial buffer
+        if data:
+            self._append(data)
+        else:
+            self._recv()  # populate initial buffer
 
     def _recv(self) -> bool:
         """
@@ -63,19 +76,29 @@ class SocketWrapper:
         """
 
         try:
-            data = self._socket.recv(self._bufsize)
-            if len(data) == 0:
+            num = self._socket.recv_into(self._recvbuf)
+            if num == 0:
                 return False
-            if self._encoding & ENCODE_CHUNKED:
-                data = self._partial + data
-                chunks, self._partial = self.dechunk(data)
-                self._buffer += chunks
-            else:
-                self._buffer += data
+            self._append(self._recvbuf[:num])
         except (OSError, TimeoutError):
             return False
         return True
 
+    def _append(self, data: bytes):
+        """
+        Append bytes read from socket to internal buffer,
+        dechunking if necessary.
+
+        :param bytes data: data read from socket (bytes or memoryview)
+        """
+
+        if self._encoding & ENCODE_CHUNKED:
+            data = self._partial + data
+            chunks, self._partial = self.dechunk(data)
+            self._buffer += chunks
+        else:
+            self._buffer += data
+
     def read(self, num: int) -> bytes:
         """
         Read specified number of bytes from buffer.
@@ -90,9 +113,10 @@ class SocketWrapper:
         while len(self._buffer) < num:
             if not self._recv():
                 return b""
-        data = self._buffer[:num]
-        self._buffer = self._buffer[num:]
-        return bytes(data)
+        data = bytes(self._buffer[:num])
+        # delete consumed bytes in place rather than copying the remainder
+        del self._buffer[:num]
+        return data
 
     def readline(self) -> bytes:
         """
@@ -103,17 +127,15 @@ class SocketWrapper:
         :rtype: bytes
         """
 
-        line = b""
+        # search internal buffer for terminator rather than reading byte by byte
+        start = 0
         while True:
-            data = self.read(1)
-            if len(data) == 1:
-                line += data
-                if line[-2:] == b"\r\n":
-                    break
-            else:
-                break
-
-        return line
+            idx = self._buffer.find(b"\r\n", start)
+            if idx != -1:
+                return self.read(idx + 2)
+            start = max(len(self._buffer) - 1, 0)
+            if not self._recv():
+                return self.read(len(self._buffer))
 
     def write(self, data: bytes, **kwargs):
         """
@@ -153,7 +175,10 @@ class SocketWrapper:
 
         while True:
             length_bytes = instream.readline()
-            if length_bytes[-2:] != b"\r\n":
+            if length_bytes in (b"\r\n", b"\n"):
+                # trailing CRLF of chunk completed in previous segment
+                continue
+            if not length_bytes.endswith(b"\r\n"):
                 # premature end of length bytes
                 partial = length_bytes
                 break
@@ -57,6 +57,19 @@ class DummySocket:
         self._buffer = self._buffer[n:]
         return b
 
+    def recv_into(self, buffer: memoryview) -> int:
+        """
+        Receive bytes from dummy socket into buffer.
+
+        :param memoryview buffer: writeable buffer
+        :returns: number of bytes read
+        :rtype: int
+        """
+
+        b = self.recv(len(buffer))
+        buffer[: len(b)] = b
+        return len(b)
+
     def send(self, data: bytes) -> int:
         """
         Send data to socket.
@@ -1,19 +1,28 @@
 """
-Test GNSSStreamer class 
+Test GNSSStreamer class
 
-Created on 3 Oct 2020 
+Created on 3 Oct 2020
 
 @author: semuadmin
 """
 
 # pylint: disable=line-too-long, invalid-name, missing-docstring, no-member
 
+import logging
 import os
 import sys
 import unittest
-from io import StringIO
+from io import BytesIO, StringIO
+from queue import Queue
+from threading import Event
+from time import sleep, time
+from unittest.mock import patch
+
+from pynmeagps import GET, NMEAMessage
+from pyubx2 import UBXReader
 
 from pygnssutils import exceptions as pge
+from pygnssutils.globals import VERBOSITY_DEBUG, VERBOSITY_MEDIUM
 from pygnssutils.gnssstreamer import (
     FORMAT_BINARY,
     FORMAT_HEX,
@@ -21,8 +30,19 @@ from pygnssutils.gnssstreamer import (
     FORMAT_JSON,
     FORMAT_PARSED,
     FORMAT_PARSEDSTRING,
+    PROTOCOLS,
     GNSSStreamer,
 )
+from pygnssutils.helpers import set_logging
+
+
+class LogCounter:
+    # counts how many times it is rendered into a log message
+    renders = 0
+
+    def __repr__(self):
+        LogCounter.renders += 1
+        return "LogCounter"
 
 
 class gnssstreamerTest(unittest.TestCase):
@@ -37,6 +57,13 @@ class gnssstreamerTest(unittest.TestCase):
         except FileNotFoundError:
             pass
 
+    def _cli_logging(self, verbosity: int):
+        # configure "pygnssutils" logger as the CLI utilities do
+        logger = logging.getLogger("pygnssutils")
+        set_logging(logger, verbosity)
+        self.addCleanup(logger.setLevel, logging.NOTSET)
+        self.addCleanup(logger.removeHandler, logger.handlers[-1])
+
     def testgnssstreamer_parsed(self):
         saved_stdout = sys.stdout
         out = StringIO()
@@ -114,6 +141,104 @@ class gnssstreamerTest(unittest.TestCase):
         sys.stdout = saved_stdout
         print(f"output = {out.getvalue().strip()}")
 
+    def testgnssstreamer_msgfilter(self):
+        with open(self.mixedfile, "rb") as stream:
+            gns = GNSSStreamer(None, stream, msgfilter=" NAV-PVT, GNGSA(1.5),, ")
+            self.assertEqual(gns._msgfilter, {"NAV-PVT": (0, 0), "GNGSA": (1.5, 0)})
+            gns = GNSSStreamer(None, stream, msgfilter=" , ")
+            self.assertEqual(gns._msgfilter, {})
+
+    def testgnssstreamer_protfiltersubclass(self):  # subclass of message class
+        class SubNMEAMessage(NMEAMessage):
+            pass
+
+        msg = SubNMEAMessage("GN", "GLL", GET)
+        protocols = dict(PROTOCOLS)
+        gns = GNSSStreamer(None, StringIO(), protfilter=1)
+        self.assertFalse(gns._filtered(msg))
+        gns = GNSSStreamer(None, StringIO(), protfilter=2)
+        self.assertTrue(gns._filtered(msg))
+        self.assertEqual(PROTOCOLS, protocols)  # shared table not modified
+
+    def _stalled_stream(self, overflow: int, ready: object) -> tuple:
+        # stream through a small message queue with an output handler which
+        # stalls until ready(streamer) is True, then return streamer & outputs
+        release = Event()
+        outputs = []
+
+        def stalled(raw_data, formatted_data, outqueue, **kwargs):
+            release.wait(5)
+            outputs.append(raw_data)
+
+        qsize = patch("pygnssutils.gnssstreamer.MSGQUEUESIZE", 2)
+        sleeptime = patch("pygnssutils.gnssstreamer.SLEEPTIME", 0.05)
+        with qsize, sleeptime, open(self.mixedfile, "rb") as stream:
+            gns = GNSSStreamer(None, stream, overflow=overflow, outputhandler=stalled)
+            gns.run()
+            deadline = time() + 5
+            while not ready(gns) and time() < deadline:
+                sleep(0.01)
+            sleep(0.2)  # reader keeps waiting (BLOCK) or dropping (DROP)
+            release.set()
+            gns._stopevent.wait(5)
+            gns.stop()
+        return gns, outputs
+
+    def testgnssstreamer_overflow(self):
+        with self.assertRaises(pge.ParameterError):
+            GNSSStreamer(None, StringIO(), overflow=2)
+
+    def testgnssstreamer_overflowdrop(self):  # messages dropped while queue full
+        gns, outputs = self._stalled_stream(1, lambda gns: gns._dropcount >= 4)
+        self.assertGreater(gns._dropcount, 0)
+        self.assertEqual(len(outputs) + gns._dropcount, 7)
+
+    def testgnssstreamer_overflowblock(self):  # reader waits while queue full
+        with open(self.mixedfile, "rb") as stream:
+            expected = [raw for raw, _ in UBXReader(stream)]
+        gns, outputs = self._stalled_stream(0, lambda gns: gns._msgqueue.full())
+        self.assertEqual(gns._dropcount, 0)
+        self.assertEqual(outputs, expected)
+
+    def testgnssstreamer_nullout(self):  # formatting skipped if not output
+        calls = []
+
+        def fmt(raw_data, parsed_data):
+            calls.append(raw_data)
+            return parsed_data
+
+        for verbosity, expected in ((VERBOSITY_MEDIUM, 0), (VERBOSITY_DEBUG, 7)):
+            calls.clear()
+            self._cli_logging(verbosity)
+            with open(self.mixedfile, "rb") as stream:
+                gns = GNSSStreamer(None, stream, verbosity=verbosity)
+                gns._formatters = (fmt,)
+                gns.run()
+                gns._stopevent.wait(5)
+                gns.stop()
+            self.assertEqual(gns._msgcount, 7)
+            self.assertEqual(len(calls), expected)
+
+    def testgnssstreamer_dooutputlog(self):  # debug message only built if logged
+        logger = logging.getLogger("pygnssutils.gnssstreamer")
+        for verbosity, expected in ((VERBOSITY_MEDIUM, 0), (VERBOSITY_DEBUG, 1)):
+            LogCounter.renders = 0
+            self._cli_logging(verbosity)
+            GNSSStreamer.do_output(b"raw", [LogCounter()], None, logger=logger)
+            self.assertEqual(LogCounter.renders, expected)
+
+    def testgnssstreamer_doinputlog(self):  # debug message only built if logged
+        logger = logging.getLogger("pygnssutils.gnssstreamer")
+        for verbosity, expected in ((VERBOSITY_MEDIUM, 0), (VERBOSITY_DEBUG, 1)):
+            LogCounter.renders = 0
+            self._cli_logging(verbosity)
+            inqueue = Queue()
+            inqueue.put((b"raw", LogCounter()))
+            datastream = BytesIO()
+            GNSSStreamer.do_input(datastream, inqueue, logger=logger)
+            self.assertEqual(datastream.getvalue(), b"raw")
+            self.assertEqual(LogCounter.renders, expected)
+
     def testgnssstreamer_outputhandler(self):
         saved_stdout = sys.stdout
         out = StringIO()
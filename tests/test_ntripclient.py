@@ -0,0 +1,149 @@
+"""
+GNSSNTRIPClient data stream tests for pygnssutils
+
+Created on 17 Oct 2026
+
+*** NB: must be saved in UTF-8 format ***
+
+@author: semuadmin
+"""
+
+# pylint: disable=line-too-long, invalid-name, missing-docstring
+
+import logging
+import os
+import unittest
+from io import StringIO
+from queue import Queue
+from threading import Event
+from unittest.mock import patch
+
+from pyubx2 import RTCM3_PROTOCOL, UBXReader
+
+from pygnssutils.globals import VERBOSITY_HIGH, VERBOSITY_MEDIUM
+from pygnssutils.gnssntripclient import GNSSNTRIPClient
+from pygnssutils.helpers import set_logging
+from tests.dummysocket import DummySocket
+
+DIRNAME = os.path.dirname(__file__)
+HEADER = (
+    b"HTTP/1.1 200 OK\r\nContent-Type: gnss/data\r\nCache-Control: no-store\r\n\r\n"
+)
+RTCMCOUNT = 1106  # RTCM3 messages in pygpsdata-rtcm3.log
+
+
+class ChunkedSocket(DummySocket):
+    """
+    Dummy socket returning predefined chunks of data, one per recv.
+
+    Sets stopevent once all chunks have been read.
+    """
+
+    def __init__(self, chunks: list, stopevent: Event):
+        # pylint: disable=super-init-not-called
+        self._chunks = list(chunks)
+        self._stopevent = stopevent
+        self.closed = Event()
+
+    def recv(self, n: int) -> bytes:
+        if not self._chunks:
+            self._stopevent.set()
+            return b""
+        b = self._chunks.pop(0)
+        if len(b) > n:  # return remainder on next recv
+            self._chunks.insert(0, b[n:])
+            b = b[:n]
+        return b
+
+    def sendall(self, data):
+        pass
+
+    def shutdown(self, how: int):
+        self.closed.set()
+
+
+class DummyApp:
+    # records <<ntrip_read>> events raised by the client
+    def __init__(self):
+        self.events = []
+
+    def set_event(self, evt: str):
+        self.events.append(evt)
+
+
+class NTRIPClientTest(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(DIRNAME, "pygpsdata-rtcm3.log"), "rb") as infile:
+            self.rtcm = infile.read()
+            infile.seek(0)
+            ubr = UBXReader(infile, protfilter=RTCM3_PROTOCOL)
+            self.rtcmraw = b"".join(raw for raw, _ in ubr)
+
+    def _run(self, chunks: list = None, **kwargs) -> tuple:
+        # stream RTCM data via run() from a dummy caster
+        app = DummyApp()
+        q = Queue()
+        ntc = GNSSNTRIPClient(app, **kwargs)
+        if chunks is None:
+            chunks = [HEADER, self.rtcm]
+        sock = ChunkedSocket(chunks, ntc.stopevent)
+        with patch.object(GNSSNTRIPClient, "_open_connection", return_value=sock):
+            ntc.run(server="dummy", mountpoint="DUMMY", output=q)
+            self.assertTrue(sock.closed.wait(10))
+        return app.events, q
+
+    def testntripnotify(self):  # app notified of every message by default
+        events, q = self._run()
+        self.assertEqual(q.qsize(), RTCMCOUNT)
+        self.assertEqual(len(events), RTCMCOUNT)
+
+    def testntripnotifycoalesce(self):  # app only notified on empty queue
+        events, q = self._run(coalesce=True)
+        self.assertEqual(q.qsize(), RTCMCOUNT)
+        self.assertEqual(len(events), 1)  # queue never drained
+
+    def testntripsplitheader(self):  # response header spans several reads
+        splits = (
+            # split inside header, body read along with end of header
+            [HEADER[:20], HEADER[20:] + self.rtcm],
+            # split inside header terminator
+            [
+                HEADER[:-3],
+                HEADER[-3:-1],
+                HEADER[-1:] + self.rtcm[:100],
+                self.rtcm[100:],
+            ],
+            # split at header terminator
+            [HEADER[:-4], HEADER[-4:], self.rtcm],
+        )
+        for chunks in splits:
+            _, q = self._run(chunks)
+            self.assertEqual(q.qsize(), RTCMCOUNT)
+            raw = b"".join(q.get()[0] for _ in range(RTCMCOUNT))
+            self.assertEqual(raw, self.rtcmraw)  # no body data lost
+
+    def _parse(self, verbosity: int) -> str:
+        # parse RTCM data under CLI logging, returning the log output
+        logger = logging.getLogger("pygnssutils")
+        with patch("sys.stderr", new_callable=StringIO) as stderr:
+            set_logging(logger, verbosity)  # handler writes to patched stderr
+            try:
+                ntc = GNSSNTRIPClient(None)
+                ntc.settings = {"server": "dummy", "mountpoint": "DUMMY"}
+                stopevent = Event()
+                sock = ChunkedSocket([self.rtcm], stopevent)
+                ntc._parse_ntrip_data(sock, ntc.settings, stopevent)
+            finally:
+                logger.removeHandler(logger.handlers[-1])
+                logger.setLevel(logging.NOTSET)
+        return stderr.getvalue()
+
+    def testntripinfoguard(self):  # message info only logged at high verbosity
+        self.assertNotIn("Message received", self._parse(VERBOSITY_MEDIUM))
+        log = self._parse(VERBOSITY_HIGH)
+        self.assertEqual(log.count("Message received: "), RTCMCOUNT)
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+SocketServer client handler tests for pygnssutils
+
+Created on 17 Oct 2026
+
+*** NB: must be saved in UTF-8 format ***
+
+@author: semuadmin
+"""
+
+# pylint: disable=line-too-long, invalid-name, missing-docstring
+
+import unittest
+from queue import SimpleQueue
+
+from pygnssutils.socket_server import MAXBATCH, ClientHandler
+
+
+class RecordingSocket:
+    # records each sendall call made by the client handler
+    def __init__(self):
+        self.sent = []
+
+    def sendall(self, data: bytes):
+        self.sent.append(data)
+
+
+class SocketServerTest(unittest.TestCase):
+    def setUp(self):
+        # client handler without a live connection
+        self.handler = ClientHandler.__new__(ClientHandler)
+        self.handler._msgqueue = SimpleQueue()
+        self.handler.request = RecordingSocket()
+
+    def testwritebatch(self):  # queued messages sent in one write, in order
+        msgs = [bytes([i]) * 10 for i in range(5)]
+        for msg in msgs:
+            self.handler._msgqueue.put(msg)
+        self.handler._write_from_mq()
+        self.assertEqual(self.handler.request.sent, [b"".join(msgs)])
+        self.assertTrue(self.handler._msgqueue.empty())
+
+    def testwritebatchlimit(self):  # batch stops at MAXBATCH bytes
+        size = MAXBATCH // 2 + 1
+        msgs = [bytes([i]) * size for i in range(3)]
+        for msg in msgs:
+            self.handler._msgqueue.put(msg)
+        self.handler._write_from_mq()
+        self.assertEqual(self.handler.request.sent, [msgs[0] + msgs[1]])
+        self.handler._write_from_mq()  # remainder sent on next call
+        self.assertEqual(self.handler.request.sent[1:], [msgs[2]])
+        self.assertTrue(self.handler._msgqueue.empty())
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -88,6 +88,18 @@ class StreamTest(unittest.TestCase):
         self.assertEqual(str(parsed), EXPECTED_RESULT)
         self.assertEqual(count, 54)
 
+    def testchunkedinitialdata(self):  # test socket read with data read with header
+        filename = os.path.join(DIRNAME, "ntrip_encode_chunked.bin")
+        dsock = DummySocket(filename, DEFAULT_BUFSIZE * 3)
+        data = dsock.recv(100)  # e.g. body content read along with response header
+        sock = SocketWrapper(dsock, encoding=ENCODE_CHUNKED, data=data)
+        ubr = UBXReader(sock, quitonerror=ERR_LOG)
+        count = 0
+        for raw, parsed in ubr:
+            if parsed is not None:
+                count += 1
+        self.assertEqual(count, 54)
+
     def testchunkedgzip(self):  # test socket read with chunking & gzip
         EXPECTED_RESULT = "<RTCM(1019, DF002=1019, DF009=17, DF076=280, DF077=0, DF078=0, DF079=-1.8769696907838807e-10, DF071=60, DF081=79200, DF082=0.0, DF083=-9.777068044058979e-12, DF084=0.0006512394174933434, DF085=60, DF086=28.78125, DF087=1.2496457202360034e-09, DF088=-0.9548183786682785, DF089=1.5757977962493896e-06, DF090=0.01348085340578109, DF091=1.1881813406944275e-05, DF092=5153.782318115234, DF093=79200, DF094=1.4901161193847656e-07, DF095=-0.14867734163999557, DF096=4.470348358154297e-08, DF097=0.3080817819572985, DF098=154.6875, DF099=-0.41714857798069715, DF100=-2.3395614334731363e-09, DF101=-1.1175870895385742e-08, DF102=0, DF103=0, DF137=1)>"
 
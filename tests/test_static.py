@@ -10,24 +10,36 @@ Created on 26 May 2022
 
 # pylint: disable=line-too-long, invalid-name, missing-docstring, no-member
 
-from os import path
+import logging
+from os import close, path, pipe, read
+from queue import Empty, Queue
 from pathlib import Path
+import tempfile
 import unittest
+from unittest.mock import patch
 from socket import AF_INET, AF_INET6
-from pyubx2 import UBXReader, itow2utc
+from types import SimpleNamespace
+from pyubx2 import SET, UBXMessage, UBXReader, itow2utc, hextable as ubxhextable
 
 from pygnssutils.exceptions import ParameterError
 from pygnssutils.helpers import (
     cel2cart,
+    find_closest_mp,
     find_mp_distance,
     format_conn,
     ipprot2int,
     ipprot2str,
     format_json,
     get_mp_distance,
+    hextable,
     parse_config,
     parse_url,
+    set_logging,
+    CachedTimeFormatter,
+    LOGHANDLERS,
 )
+from pygnssutils.globals import CLIAPP
+from pygnssutils.gnssmqttclient import GNSSMQTTClient
 from pygnssutils.mqttmessage import MQTTMessage
 from tests.test_sourcetable import TESTSRT
 
@@ -86,6 +98,12 @@ class StaticTest(unittest.TestCase):
         res = format_json(msg)
         self.assertEqual(res[-70:], json[-70:])
 
+    def testhextable(self):  # must match pyubx2 hextable exactly
+        raw = bytes(range(256))
+        for n in (0, 1, 15, 16, 17, 33, 256):
+            for cols in (1, 4, 8):
+                self.assertEqual(hextable(raw[:n], cols), ubxhextable(raw[:n], cols))
+
     def testfindmpdist1(self):  # no name, find closest
         lat = 54.8
         lon = -7.4
@@ -114,6 +132,14 @@ class StaticTest(unittest.TestCase):
         res = find_mp_distance(lat, lon, TESTSRT, name)
         self.assertEqual(res, (None, 9999999))
 
+    def testfindclosestmp(self):  # closest agrees with full distance
+        for lat, lon in ((54.8, -7.4), (53.0, -2.24), (-33.9, 151.2)):
+            res = find_closest_mp(lat, lon, TESTSRT)
+            dists = [get_mp_distance(lat, lon, mp) for mp in TESTSRT]
+            mindist = min(d for d in dists if d is not None)
+            self.assertEqual(get_mp_distance(lat, lon, res), mindist)
+        self.assertIsNone(find_closest_mp(53.0, -2.24, [["AUADL"]]))
+
     def testgetmpdist1(self):  # valid
         mp = TESTSRT[12]
         lat = 54.8
@@ -203,6 +229,88 @@ class StaticTest(unittest.TestCase):
         with self.assertRaises(ParameterError):
             res = parse_url(URL)
 
+    def testcachedtimeformatter(self):
+        fmt = CachedTimeFormatter("{asctime}", datefmt="%H:%M:%S", style="{")
+        rec1 = logging.makeLogRecord({"created": 1000.1, "msg": "one"})
+        rec2 = logging.makeLogRecord({"created": 1000.9, "msg": "two"})
+        rec3 = logging.makeLogRecord({"created": 1001.2, "msg": "three"})
+        ref = logging.Formatter("{asctime}", datefmt="%H:%M:%S", style="{")
+        for rec in (rec1, rec2, rec3):
+            self.assertEqual(fmt.format(rec), ref.format(rec))
+
+    def testsetloggingshared(self):  # loggers share one handler per log file
+        logfile = path.join(tempfile.gettempdir(), "pygnssutils_test.log")
+        log1 = logging.getLogger("pygnssutils_test1")
+        log2 = logging.getLogger("pygnssutils_test2")
+        log3 = logging.getLogger("pygnssutils_test3")
+        self.addCleanup(self._clear_loghandlers, logfile, (log1, log2, log3))
+        set_logging(log1, 3, logfile)
+        set_logging(log1, 3, logfile)
+        set_logging(log2, 3, logfile)
+        set_logging(log3, 3, logfile, limit=1024)
+        self.assertEqual(len(log1.handlers), 1)
+        self.assertIs(log1.handlers[0], log2.handlers[0])
+        self.assertIsNot(log1.handlers[0], log3.handlers[0])
+        self.assertEqual(log3.handlers[0].maxBytes, 1024)
+
+    def _clear_loghandlers(self, logfile: str, loggers: tuple):
+        # remove and close cached file handlers, so later tests start afresh
+        for key in [key for key in LOGHANDLERS if key[0] == logfile]:
+            LOGHANDLERS.pop(key).close()
+        for lg in loggers:
+            lg.handlers.clear()
+            lg.setLevel(logging.NOTSET)
+
+    def testmqttgetwriter(self):  # test MQTT output writer resolution
+        q = Queue()
+        GNSSMQTTClient._get_writer(q, None)(b"raw", "parsed")
+        GNSSMQTTClient._get_writer(q, CLIAPP)(b"raw", "parsed")
+        self.assertEqual(q.get(), (b"raw", "parsed"))
+        self.assertEqual(q.get(), b"raw")
+        rfd, wfd = pipe()
+        GNSSMQTTClient._get_writer(wfd, None)(b"raw", "parsed")
+        self.assertEqual(read(rfd, 3), b"raw")
+        close(rfd)
+        close(wfd)
+        self.assertIsNone(GNSSMQTTClient._get_writer(None, None))
+        self.assertIsNone(GNSSMQTTClient._get_writer(True, None))
+
+    def testmqttwritefd(self):  # test partial writes to file descriptor
+        written = []
+
+        def shortwrite(fd, data):  # write at most 3 bytes per call
+            written.append(bytes(data[:3]))
+            return len(written[-1])
+
+        with patch("pygnssutils.gnssmqttclient.write", shortwrite):
+            GNSSMQTTClient._get_writer(99, None)(b"abcdefghij", "parsed")
+        self.assertEqual(written, [b"abc", b"def", b"ghi", b"j"])
+
+    def testmqttnotify(self):  # test app notified per message, or once if coalescing
+        msg = UBXMessage(
+            "CFG", "CFG-MSG", SET, msgClass=0x01, msgID=0x07, rateUART1=1
+        ).serialize()
+        for coalesce, expected in ((False, 3), (True, 1)):
+            q = Queue()
+            events = []
+            userdata = {
+                "writer": GNSSMQTTClient._get_writer(q, None),
+                "notify": events.append,
+                "coalesce": coalesce,
+                "logger": logging.getLogger("pygnssutils.gnssmqttclient"),
+            }
+            GNSSMQTTClient.on_message(
+                None, userdata, SimpleNamespace(topic="/pp/ubx/mga", payload=msg * 3)
+            )
+            self.assertEqual(len(events), expected)
+            items = []  # whole payload available after (first) notify
+            try:
+                while True:
+                    items.append(q.get(False))
+            except Empty:
+                pass
+            self.assertEqual([raw for raw, _ in items], [msg] * 3)
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']